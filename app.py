@@ -1,14 +1,16 @@
 from order_optimization import *
-from threading import Thread
-from typing import List
-import random
+from order_optimization.metrics import write_prometheus_text
+from order_simulation.live import LiveSimulation
+import os
 import time
 
+# Times per second the dashboard redraws from the background simulation
+FRAME_RATE = 5
+# Order cards copied and drawn per frame: the group being cooked, then the top of the queue
+PAGE_SIZE = 30
+
 def main():
     st.set_page_config(page_title="Order Optimization", layout="wide", page_icon="src/images/mini_logo.png")
-    # Define the dishes and their complexities
-    dishes: List[Dish] = [Dish('Margherita', 7), Dish('Pepperoni', 10), Dish('Four Cheese', 15), Dish('Vegan', 7), Dish('Supreme', 10), Dish('Mushroom', 8)]
-
     # Apply custom styles
     apply_styles()
 
@@ -17,6 +19,7 @@ def main():
     orders_input = False
     order_priority_input = False
     number_of_orders_value = 2
+    metrics_input = False
     
     # Create placeholders
     intro_container = st.empty()
@@ -47,6 +50,8 @@ def main():
             orders_input = orders_input == 'Yes'
             order_priority_input = st.radio("Add Weight to Complex Orders: ", ('Yes', 'No'))
             order_priority_input = order_priority_input == 'No'
+            metrics_input = st.checkbox("Show engine metrics")
+            metrics_container = st.empty()
             
     # Display the introduction text
     if not st.session_state.get('start_button_clicked', False):
@@ -76,109 +81,60 @@ def main():
         # Display the app title
         st.title('Dashboard: Bella Napoli Pizzeria 🍕')
         
-        # Create an instance of ROO
-        roo: ROO = ROO(driver_weight=driver_input, order_group_weight=orders_input, order_priority_weight=order_priority_input)
-            
-        # Run the restaurant simulation
-        run_restaurant_simulation(dishes, roo, number_of_orders_value)
+        # The simulation runs in a background thread that lives as long as the session, so
+        # widget changes rerun this script without restarting it
+        simulation = st.session_state.get('simulation')
+        if simulation is None:
+            # A minute of the simulation lasts 0.6 seconds
+            simulation = LiveSimulation(number_of_orders_value, driver_input, orders_input, order_priority_input,
+                                        seconds_per_complexity=0.6, metrics=metrics_input).start()
+            st.session_state['simulation'] = simulation
+            st.session_state['card_cache'] = OrderCardCache()
+        simulation.configure(driver_weight=driver_input, order_group_weight=orders_input,
+                             order_priority_weight=order_priority_input, metrics=metrics_input)
 
+        watch_restaurant_simulation(simulation, st.session_state['card_cache'], metrics_container if metrics_input else None)
 
 
 
 
 
-def run_restaurant_simulation(dishes: List[Dish], roo: ROO, number_of_orders: int):
-    # Initialize order id
-    order_id = 0
 
-    # Initialize Streamlit containers for orders and processing orders©
+def refresh_metrics(snapshot, metrics_container):
+    # Everything shown was read under the simulation lock by snapshot()
+    if metrics_container is None:
+        return
+    show_metrics(snapshot.metrics, metrics_container, snapshot.kpis)
+    if snapshot.prometheus is not None:
+        write_prometheus_text(os.environ['ROO_METRICS_FILE'], snapshot.prometheus)
+
+
+def watch_restaurant_simulation(simulation: LiveSimulation, cache: OrderCardCache, metrics_container=None):
+    """Redraw the dashboard from snapshots of the simulation, FRAME_RATE times per second, until it is done."""
     st.markdown(f"""<br><br>""", unsafe_allow_html=True)
     processing_order_container = st.empty()
     st.markdown(f"""<br><br>""", unsafe_allow_html=True)
     orders_container = st.empty()
-    # Define possible sources of orders
-    sources = ['Bolt Foods', 'UberEats', 'Glovo', 'In Restaurant']
-    weights = [1.5, 1.5, 1.5, 4.5]
-    
-    finnish_all_orders = True
-    no_more_orders_to_add = True
-
-
-    while finnish_all_orders:
-        # Create a new order with random parameters
-        order_dishes = random.sample(dishes, random.randint(1, len(dishes))) 
-        driver_wait_time = random.randint(7, 20)  # 5-20 minutes
-        order_source = random.choices(sources, weights=weights, k=1)[0]  # randomly select the source of the order
-        order = Order(order_id, time.time(), order_dishes, order_source, driver_wait_time)
-        #show_orders(roo, orders_container)
-        if order_id <= 10 and no_more_orders_to_add:
-            # Add the new order to the queue
-            roo.add_order(order)
-            for _ in range(5):
-                show_orders(roo, orders_container)
-            
-        # Update the priorities and try to start a new order
-        roo.optimize_orders()
-        show_orders(roo, orders_container)
-        random_bool_add_more_orders_weights = [5, 5]
-        random_bool_add_more_orders = random.choices([True, False], weights=random_bool_add_more_orders_weights, k=1)[0]
-        if random_bool_add_more_orders and order_id > 0:
-            roo.start_order()
-            # Update the priorities when removing the process order
-            roo.optimize_orders()
-            for _ in range(5):
-                orders_container.empty()
-                show_orders(roo, orders_container)            # Clear processing order container and show the processing order
-            if roo.current_order:
-                #show_orders(roo, orders_container)
-                # Find the order with the highest total complexity
-                max_complexity_order = max(roo.current_order, key=lambda x: x.total_complexity)
-                for i in range(max_complexity_order.total_complexity, -1, -1):
-                    for order in roo.current_order:
-                        for _ in range(5):
-                            orders_container.empty()
-                            show_orders(roo, orders_container)
-                        # Decrease the complexity of each order by 1, but not lower than 0
-                        order.total_complexity = max(0, order.total_complexity - 1)
-                    processing_order_container.empty()
-                    # Collect all the current order IDs in a list
-                    current_order_ids = [order.order_id for order in roo.current_order]
-
-                    # Display the processing message with all the current order IDs and remaining time of the max complexity order
-                    processing_order_container.write(f"Processing orders {', '.join([str(order_id) for order_id in current_order_ids])}, remaining time: {i}")
-                    show_orders(roo, orders_container)
-                    # Update the priorities when removing the process order
-                    roo.optimize_orders()
-                    # Clear orders container and show all orders
-                    show_orders(roo, orders_container)
-                    time.sleep(0.6)  # simulate processing time
-                # Check the order is finnished
-                roo.process_order()
-                show_orders(roo, orders_container)
-                # Update the priorities when removing the process order
-                
-                roo.optimize_orders()
-                show_orders(roo, orders_container)
-        
-        # Increase order id
-        if order_id <= number_of_orders:
-            order_id += 1
-        elif order_id > number_of_orders and len(roo.orders) == 0:
-            finnish_all_orders = False
-        
-        if order_id == number_of_orders:
-            no_more_orders_to_add = False
-            
-        # Simulate a delay before the next order comes in
-        #show_orders(roo, orders_container)
-        for _ in range(5):
-            orders_container.empty()
-            show_orders(roo, orders_container)
-        time.sleep(random.uniform(0.2, 3.5)) 
-        orders_container.empty()
-        show_orders(roo, orders_container)# wait for a random time before adding the next order
-    # Clear orders container and show all orders
-    #orders_container.empty()
+
+    # Set ROO_METRICS_FILE to have a Prometheus textfile collector pick the metrics up
+    prometheus = metrics_container is not None and bool(os.environ.get('ROO_METRICS_FILE'))
+    shown_version = None
+    while True:
+        snapshot = simulation.snapshot(limit=PAGE_SIZE, cache=cache, prometheus=prometheus)
+        # Only redraw when the queue changed since the last frame
+        if snapshot.version != shown_version:
+            if snapshot.processing is not None:
+                order_ids, remaining = snapshot.processing
+                # Display the processing message with all the current order IDs and remaining time of the max complexity order
+                processing_order_container.write(f"Processing orders {', '.join([str(order_id) for order_id in order_ids])}, remaining time: {remaining}")
+            else:
+                processing_order_container.empty()
+            show_snapshot(snapshot, orders_container, cache)
+            refresh_metrics(snapshot, metrics_container)
+            shown_version = snapshot.version
+        if snapshot.finished:
+            break
+        time.sleep(1 / FRAME_RATE)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,129 @@
+"""Load generator for the ingestion service.
+
+Producers push seeded orders at a target rate, in process through IngestionService.submit or
+as JSON over its HTTP endpoint, while a kitchen with fast stations drains the queue. Reports
+the orders per second accepted and the ingest latency (submitted until in the ROO queue).
+
+Run from the repository root:
+
+    python -m benchmarks.ingest --rate 5000 --seconds 5
+    python -m benchmarks.ingest --mode http --rate 5000 --seconds 5
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from order_optimization import ROO, KitchenExecutor, Station
+from order_optimization.service import IngestionService
+from order_simulation.simulation import OrderGenerator
+
+
+async def produce_in_process(service, generator, rate, seconds, first_id):
+    # Submit orders in small bursts so the achieved rate follows the target
+    burst = max(1, rate // 100)
+    started = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - started < seconds:
+        for _ in range(burst):
+            await service.submit(generator.make_order(first_id + sent, service.roo.clock()))
+            sent += 1
+        delay = started + sent / rate - time.perf_counter()
+        await asyncio.sleep(max(0, delay))
+    return sent
+
+
+def order_json(order):
+    return {'dishes': [dish.name for dish in order.dishes], 'source': order.source,
+            'driver_wait_time': order.driver_wait_time}
+
+
+async def produce_http(port, generator, rate, seconds, first_id, batch, latencies):
+    # One keep-alive connection posting `batch` orders per request
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    started = time.perf_counter()
+    sent = 0
+    rejected = 0
+    while time.perf_counter() - started < seconds:
+        body = json.dumps([order_json(generator.make_order(first_id + sent + i, 0)) for i in range(batch)]).encode()
+        request_started = time.perf_counter()
+        writer.write(b'POST /orders HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+                     + f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+        await writer.drain()
+        status = await reader.readline()
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            if line.lower().startswith(b'content-length:'):
+                length = int(line.split(b':')[1])
+        response = json.loads(await reader.readexactly(length))
+        latencies.append(time.perf_counter() - request_started)
+        sent += response.get('accepted', 0)
+        if b' 429 ' in status:
+            rejected += batch - response.get('accepted', 0)
+        delay = started + (sent + rejected) / rate - time.perf_counter()
+        await asyncio.sleep(max(0, delay))
+    writer.close()
+    return sent
+
+
+async def run(mode, rate, seconds, producers, stations, seconds_per_complexity, batch_size, max_pending, max_queued,
+              http_batch, port, kinetic):
+    roo = ROO(driver_weight=True, order_group_weight=True, order_priority_weight=True, kinetic=kinetic,
+              seconds_per_minute=seconds_per_complexity)
+    kitchen = KitchenExecutor(roo, [Station(f'Station {i + 1}', capacity=4) for i in range(stations)],
+                              seconds_per_complexity=seconds_per_complexity)
+    service = IngestionService(roo, kitchen, batch_size=batch_size, max_pending=max_pending, max_queued=max_queued)
+    await service.start()
+    request_latencies = []
+    if mode == 'http':
+        await service.serve_http('127.0.0.1', port)
+    started = time.perf_counter()
+    jobs = []
+    for i in range(producers):
+        generator = OrderGenerator(seed=i)
+        if mode == 'http':
+            jobs.append(produce_http(port, generator, rate // producers, seconds, i * 10_000_000, http_batch,
+                                     request_latencies))
+        else:
+            jobs.append(produce_in_process(service, generator, rate // producers, seconds, i * 10_000_000))
+    sent = sum(await asyncio.gather(*jobs))
+    await service.pending.join()
+    elapsed = time.perf_counter() - started
+    stats = service.stats()
+    await service.stop()
+
+    print(f"{sent:,} orders in {elapsed:.2f}s: {sent / elapsed:,.0f} orders/s accepted, {stats['rejected']:,} rejected")
+    print(f"ingest latency p50 {stats['ingest_p50_s'] * 1e3:.2f}ms  p99 {stats['ingest_p99_s'] * 1e3:.2f}ms  "
+          f"over {stats['batches']:,} batches (largest {stats['largest_batch']})")
+    if request_latencies:
+        request_latencies.sort()
+        p50 = request_latencies[len(request_latencies) // 2]
+        p99 = request_latencies[int(0.99 * (len(request_latencies) - 1))]
+        print(f"HTTP request latency p50 {p50 * 1e3:.2f}ms  p99 {p99 * 1e3:.2f}ms")
+    print(f"left in queue {stats['queued']:,}, cooking {stats['in_progress']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the order ingestion service.")
+    parser.add_argument('--mode', choices=('queue', 'http'), default='queue')
+    parser.add_argument('--rate', type=int, default=5000, help="target orders per second over all producers")
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--producers', type=int, default=4)
+    parser.add_argument('--stations', type=int, default=32)
+    parser.add_argument('--seconds-per-complexity', type=float, default=0.00005)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--max-pending', type=int, default=10_000)
+    parser.add_argument('--max-queued', type=int, default=5_000)
+    parser.add_argument('--http-batch', type=int, default=20, help="orders per HTTP request")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--kinetic', action='store_true')
+    args = parser.parse_args()
+    asyncio.run(run(args.mode, args.rate, args.seconds, args.producers, args.stations, args.seconds_per_complexity,
+                    args.batch_size, args.max_pending, args.max_queued, args.http_batch, args.port, args.kinetic))
+
+
+if __name__ == '__main__':
+    main()
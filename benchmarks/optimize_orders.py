@@ -0,0 +1,67 @@
+"""Compare the scalar and vectorized ROO.optimize_orders passes.
+
+Run from the repository root: python -m benchmarks.optimize_orders
+"""
+import copy
+import random
+import time
+
+from order_optimization import ROO, Dish, Order
+
+DISHES = [Dish('Margherita', 7), Dish('Pepperoni', 10), Dish('Four Cheese', 15), Dish('Vegan', 7), Dish('Supreme', 10), Dish('Mushroom', 8)]
+SOURCES = ['Bolt Foods', 'UberEats', 'Glovo', 'In Restaurant']
+WEIGHTS = [1.5, 1.5, 1.5, 4.5]
+
+
+def make_orders(n, seed=0):
+    rng = random.Random(seed)
+    now = time.time()
+    orders = []
+    for order_id in range(n):
+        order_dishes = rng.sample(DISHES, rng.randint(1, len(DISHES)))
+        source = rng.choices(SOURCES, weights=WEIGHTS, k=1)[0]
+        # Spread arrivals over the last hour without two orders sharing a timestamp
+        order_time = now - 3600 * (n - order_id - rng.random()) / n
+        orders.append(Order(order_id, order_time, order_dishes, source, rng.randint(7, 20)))
+    return orders
+
+
+def build_roo(orders, vectorized, clock=time.time):
+    roo = ROO(driver_weight=True, order_group_weight=True, order_priority_weight=True, vectorized=vectorized, clock=clock)
+    for order in copy.deepcopy(orders):
+        roo.add_order(order)
+    return roo
+
+
+def same_ordering(orders, passes=3):
+    # The scalar path reads the clock once per order, so freeze it to compare like with like
+    now = time.time()
+    rankings = []
+    for vectorized in (False, True):
+        roo = build_roo(orders, vectorized, clock=lambda: now)
+        for _ in range(passes):
+            roo.optimize_orders()
+        rankings.append([order.order_id for _, order in roo.orders])
+    return rankings[0] == rankings[1]
+
+
+def time_optimize(roo, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        roo.optimize_orders()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(sizes=(1_000, 10_000, 100_000), repeat=5):
+    print(f"{'orders':>8} {'scalar (ms)':>12} {'vectorized (ms)':>16} {'speedup':>8} {'same order':>11}")
+    for n in sizes:
+        orders = make_orders(n)
+        scalar = time_optimize(build_roo(orders, False), repeat)
+        vector = time_optimize(build_roo(orders, True), repeat)
+        print(f"{n:>8} {scalar * 1000:>12.2f} {vector * 1000:>16.2f} {scalar / vector:>7.1f}x {str(same_ordering(orders)):>11}")
+
+
+if __name__ == '__main__':
+    main()
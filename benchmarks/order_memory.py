@@ -0,0 +1,50 @@
+"""Memory per queued order and dish-overlap comparison throughput.
+
+Run from the repository root: python -m benchmarks.order_memory
+"""
+import random
+import time
+import tracemalloc
+
+from order_optimization import ROO
+
+from .optimize_orders import make_orders
+
+
+def memory_per_order(n):
+    tracemalloc.start()
+    orders = make_orders(n)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(orders), orders
+
+
+def set_overlap(order1, order2):
+    # The set-based check dishes_in_common used before orders carried a dish mask
+    common_dishes = len(set(order1.dishes) & set(order2.dishes))
+    return 0 < common_dishes <= 3 and common_dishes == min(len(order1.dishes), len(order2.dishes))
+
+
+def comparisons_per_second(check, pairs):
+    start = time.perf_counter()
+    for order1, order2 in pairs:
+        check(order1, order2)
+    return len(pairs) / (time.perf_counter() - start)
+
+
+def main(n=100_000):
+    per_order, orders = memory_per_order(n)
+    print(f"orders: {n:,}")
+    print(f"memory per order: {per_order:,.0f} bytes")
+
+    rng = random.Random(1)
+    pairs = [(rng.choice(orders), rng.choice(orders)) for _ in range(n)]
+    roo = ROO(driver_weight=True, order_group_weight=True, order_priority_weight=True)
+    mask_rate = comparisons_per_second(roo.dishes_in_common, pairs)
+    set_rate = comparisons_per_second(set_overlap, pairs)
+    print(f"dishes_in_common (bitmask): {mask_rate:,.0f} comparisons/s")
+    print(f"dishes_in_common (sets):    {set_rate:,.0f} comparisons/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+"""Throughput and driver wait as the number of kitchen stations grows.
+
+Run from the repository root: python -m benchmarks.stations
+"""
+import time
+
+from order_optimization import Station
+from order_simulation.simulation import RestaurantSimulation
+
+
+def main(station_counts=(1, 2, 4, 8, 12, 16), n_orders=2000, seed=0):
+    print(f"{'stations':>8} {'orders/hour':>12} {'mean wait (s)':>14} {'driver wait (s)':>16} {'wall (s)':>9}")
+    for count in station_counts:
+        started = time.perf_counter()
+        simulation = RestaurantSimulation(n_orders, seed=seed, stations=[Station(f'Station {i + 1}') for i in range(count)])
+        simulation.run()
+        summary = simulation.summary()
+        print(f"{count:>8} {summary['orders_per_hour']:>12.0f} {summary['mean_wait']:>14.1f} "
+              f"{summary['mean_driver_wait']:>16.1f} {time.perf_counter() - started:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
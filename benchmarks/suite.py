@@ -0,0 +1,203 @@
+"""Benchmark suite for the ROO hot paths and the simulation throughput.
+
+Every workload is seeded and drawn from the dashboard's menu and source mix, so two runs on the
+same machine measure the same thing. Results can be saved as a JSON baseline and later runs
+compared against it:
+
+    python -m benchmarks.suite --save benchmarks/baseline.json
+    python -m benchmarks.suite --compare benchmarks/baseline.json
+
+The comparison exits with status 1 when an operation's median latency regressed by more than
+--tolerance. Nothing here needs Streamlit.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from order_optimization.order_optimization import ROO
+from order_simulation.simulation import OrderGenerator, RestaurantSimulation
+
+SIZES = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+OPERATIONS = ('add_order', 'optimize_orders', 'start_order', 'modify_order', 'process_order')
+
+
+def build_queue(n, seed, vectorized):
+    generator = OrderGenerator(seed)
+    # A fixed clock keeps the priorities, and so the work done per call, the same between runs
+    start = 1_688_378_400.0
+    roo = ROO(driver_weight=True, order_group_weight=True, order_priority_weight=True,
+              vectorized=vectorized, clock=lambda: start + 3600)
+    for order_id in range(n):
+        roo.add_order(generator.make_order(order_id, start + 3600 * order_id / n))
+    return roo, generator
+
+
+def calls_for(operation, n):
+    # Enough calls for stable percentiles without spending minutes on the full-queue passes
+    if operation == 'optimize_orders':
+        return max(3, min(50, 200_000 // n))
+    return 200
+
+
+def measure(operation, roo, generator, calls, rng):
+    """Run `calls` calls of the operation on roo and return their latencies in seconds."""
+    latencies = []
+    perf_counter = time.perf_counter
+    next_id = len(roo.orders) + 10_000_000
+    if operation == 'add_order':
+        new_orders = [generator.make_order(next_id + i, roo.clock()) for i in range(calls)]
+        for order in new_orders:
+            started = perf_counter()
+            roo.add_order(order)
+            latencies.append(perf_counter() - started)
+        for order in new_orders:
+            roo.cancel_order(order.order_id)
+    elif operation == 'optimize_orders':
+        for _ in range(calls):
+            started = perf_counter()
+            roo.optimize_orders()
+            latencies.append(perf_counter() - started)
+    elif operation == 'start_order':
+        for _ in range(calls):
+            started = perf_counter()
+            roo.start_order()
+            latencies.append(perf_counter() - started)
+            # Put the group back so the queue keeps its size
+            group, roo.current_order = roo.current_order, None
+            for order in group:
+                roo.add_order(order)
+    elif operation == 'modify_order':
+        for _ in range(calls):
+            order_id = roo.orders[rng.randrange(len(roo.orders))][1].order_id
+            driver_wait_time = rng.randint(7, 20)
+            started = perf_counter()
+            roo.modify_order(order_id, driver_wait_time=driver_wait_time)
+            latencies.append(perf_counter() - started)
+    elif operation == 'process_order':
+        roo.start_order()
+        for order in roo.current_order:
+            order.total_complexity += calls
+        for _ in range(calls):
+            started = perf_counter()
+            roo.process_order()
+            latencies.append(perf_counter() - started)
+        group, roo.current_order = roo.current_order, None
+        for order in group:
+            order.total_complexity = order.dish_complexity
+            roo.add_order(order)
+    return latencies
+
+
+def memory_per_call(operation, roo, generator, rng, calls=3):
+    # Peak bytes allocated while the operation runs, measured on a few calls under tracemalloc
+    tracemalloc.start()
+    peaks = []
+    for _ in range(calls):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        measure(operation, roo, generator, 1, rng)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return max(peaks)
+
+
+def percentiles(latencies):
+    values = np.array(latencies) * 1e6
+    return {
+        'calls': len(latencies),
+        'mean_us': float(values.mean()),
+        'p50_us': float(np.percentile(values, 50)),
+        'p95_us': float(np.percentile(values, 95)),
+        'p99_us': float(np.percentile(values, 99)),
+    }
+
+
+def simulation_throughput(n_orders, seed):
+    started = time.perf_counter()
+    simulation = RestaurantSimulation(n_orders, seed=seed, seconds_per_complexity=0.05)
+    simulation.run()
+    elapsed = time.perf_counter() - started
+    return {'orders': n_orders, 'seconds': elapsed, 'orders_per_s': n_orders / elapsed}
+
+
+def run(sizes=SIZES, operations=OPERATIONS, seed=0, vectorized=False, simulation_orders=20_000, memory=True):
+    results = {'meta': {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'seed': seed,
+        'vectorized': vectorized,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }, 'operations': {}}
+    for n in sizes:
+        roo, generator = build_queue(n, seed, vectorized)
+        rng = random.Random(seed)
+        for operation in operations:
+            stats = percentiles(measure(operation, roo, generator, calls_for(operation, n), rng))
+            if memory:
+                stats['peak_bytes_per_call'] = memory_per_call(operation, roo, generator, rng)
+            results['operations'].setdefault(operation, {})[str(n)] = stats
+            print(f"{operation:>16} {n:>9,} p50 {stats['p50_us']:>12.1f}us  p95 {stats['p95_us']:>12.1f}us  "
+                  f"p99 {stats['p99_us']:>12.1f}us" + (f"  peak {stats['peak_bytes_per_call']:>12,} B" if memory else ''))
+        del roo
+    if simulation_orders:
+        results['simulation'] = simulation_throughput(simulation_orders, seed)
+        print(f"{'simulation':>16} {simulation_orders:>9,} {results['simulation']['orders_per_s']:,.0f} orders/s")
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta_us=5.0):
+    """Return a list of (operation, size, baseline p50, current p50) that got slower than tolerance allows.
+
+    Differences under min_delta_us are timer noise on the microsecond-scale operations and are ignored.
+    """
+    regressions = []
+    for operation, sizes in results['operations'].items():
+        for size, stats in sizes.items():
+            previous = baseline.get('operations', {}).get(operation, {}).get(size)
+            if (previous and stats['p50_us'] > previous['p50_us'] * (1 + tolerance)
+                    and stats['p50_us'] - previous['p50_us'] > min_delta_us):
+                regressions.append((operation, size, previous['p50_us'], stats['p50_us']))
+    if 'simulation' in results and 'simulation' in baseline:
+        previous, current = baseline['simulation']['orders_per_s'], results['simulation']['orders_per_s']
+        if current < previous / (1 + tolerance):
+            regressions.append(('simulation', 'orders/s', previous, current))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ROO hot paths and the simulation.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES))
+    parser.add_argument('--operations', nargs='+', choices=OPERATIONS, default=list(OPERATIONS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--vectorized', action='store_true')
+    parser.add_argument('--simulation-orders', type=int, default=20_000)
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="JSON baseline to check the results against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown before flagging, 0.25 = 25%%")
+    parser.add_argument('--min-delta-us', type=float, default=5.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.operations, args.seed, args.vectorized, args.simulation_orders, not args.no_memory)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta_us)
+        for name, size, previous, current in regressions:
+            print(f"REGRESSION {name} {size}: {previous:,.1f} -> {current:,.1f}")
+        if regressions:
+            sys.exit(1)
+        print("no regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,8 @@
 from .order_optimization import ROO
-from .utils import *
\ No newline at end of file
+from .order import Dish, Menu, Order, menu
+from .stations import KitchenExecutor, Station
+try:
+    from .utils import *
+except ImportError:
+    # Streamlit is only needed for the dashboard helpers, the engine runs without it
+    pass
@@ -0,0 +1,211 @@
+import itertools
+import math
+import time
+
+# Deadline checks in the inner loops happen once every this many steps
+CHECK_EVERY = 64
+
+class LookaheadBatcher:
+    """Chooses the next group to cook by planning the top `window` orders ahead.
+
+    The kitchen is taken to cook one group after the other, each for the longest preparation
+    time among its orders, spread over the `stations` that share the queue. A group holds up
+    to `capacity` orders that one of them, the lead, can be batched with
+    (ROO.dishes_in_common), as in start_order. A plan splits the window into groups and
+    puts them in a sequence; its cost is the sum of the completion times plus
+    `driver_weight` times the time drivers wait for their food, and every queued order
+    behind the window waits for the whole plan. Only the first group of the cheapest plan
+    is started; the next decision plans again with the orders that arrived meanwhile.
+
+    Windows of up to `exact` orders are solved exactly with a dynamic program over the set
+    of orders planned so far, keeping every (elapsed time, cost) pair that is not beaten on
+    both. Larger windows plan the first `exact` orders exactly and then add orders from the
+    rest of the window to the first group while that lowers the cost.
+
+    `budget` is a hard limit on a decision: every loop checks the deadline and a decision
+    that reaches it gives up, and ROO falls back to its greedy pairing. Before planning,
+    the exact part is cut down to the orders whose plans the budget can pay for. The cost
+    of a step is measured on the decisions made so far.
+    """
+
+    def __init__(self, window=12, capacity=4, exact=6, budget=0.005, driver_weight=1.0, stations=1):
+        self.window = window
+        self.capacity = capacity
+        self.exact = exact
+        self.budget = budget
+        self.driver_weight = driver_weight
+        self.stations = stations
+        self.decisions = 0
+        self.fallbacks = 0
+        self.slowest = 0.0
+        # Seconds per step of the dynamic program, measured as decisions are made
+        self.step_time = 1e-6
+
+    def choose(self, roo, capacity, dish_mask=None):
+        """Return the orders to start now, still queued in roo, or None when out of time."""
+        started = time.perf_counter()
+        deadline = started + self.budget
+        orders = []
+        for _, order in roo.orders.iter_sorted():
+            if time.perf_counter() > deadline:
+                break
+            if dish_mask is None or not order.dish_mask & ~dish_mask:
+                orders.append(order)
+                if len(orders) == self.window:
+                    break
+        if not orders:
+            return None if time.perf_counter() > deadline else []
+        if len(orders) == 1:
+            return orders
+
+        now = roo.clock()
+        seconds = roo.model.seconds_per_minute
+        durations = [order.total_complexity * seconds / self.stations for order in orders]
+        # Seconds from now until each driver arrives (None for orders eaten in the restaurant);
+        # scalar scoring wears driver_wait_time down a little, so drivers are expected slightly early
+        arrivals = [order.order_time + order.driver_wait_time * seconds - now if order.source != 'In Restaurant' else None
+                    for order in orders]
+        behind = len(roo.orders) - len(orders)
+        mates = self._mates(roo, orders[:min(len(orders), self.exact)], deadline)
+        group = None
+        if mates is not None:
+            planning = time.perf_counter()
+            head, steps = self._affordable(mates, capacity, deadline - planning)
+            group = self._plan_exact(orders[:head], [[j for j in row if j < head] for row in mates[:head]], durations,
+                                     arrivals, capacity, behind + len(orders) - head, deadline)
+            if steps:
+                # Keep the estimated cost of a step, and so what the budget affords, up to date
+                self.step_time = 0.8 * self.step_time + 0.2 * (time.perf_counter() - planning) / steps
+        if group is not None and len(orders) > head:
+            group = self._extend(roo, orders, group, durations, arrivals, capacity, behind, deadline)
+        self.decisions += 1
+        self.slowest = max(self.slowest, time.perf_counter() - started)
+        if group is None:
+            self.fallbacks += 1
+            return None
+        return [orders[i] for i in group]
+
+    @staticmethod
+    def _mates(roo, orders, deadline):
+        # For every order, the others it can lead a group with, or None when out of time
+        mates = [[] for _ in orders]
+        for i, order in enumerate(orders):
+            if time.perf_counter() > deadline:
+                return None
+            for j in range(i + 1, len(orders)):
+                if roo.dishes_in_common(order, orders[j]):
+                    mates[i].append(j)
+                    mates[j].append(i)
+        return mates
+
+    def _steps(self, mates, capacity, n):
+        # Estimated steps of _plan_exact over the first n orders: every group of a lead and its
+        # mates, tried from every set of planned orders it does not overlap
+        steps = 0
+        for row in mates[:n]:
+            count = sum(1 for j in row if j < n)
+            for size in range(min(capacity - 1, count) + 1):
+                steps += math.comb(count, size) << (n - 1 - size)
+        return steps
+
+    def _affordable(self, mates, capacity, remaining):
+        # The most orders (at least 1) the dynamic program can plan in half the remaining time,
+        # with the estimated steps for them
+        n = len(mates)
+        steps = self._steps(mates, capacity, n)
+        while n > 1 and steps * self.step_time > remaining / 2:
+            n -= 1
+            steps = self._steps(mates, capacity, n)
+        return n, steps
+
+    def _feasible_groups(self, mates, durations, capacity, deadline):
+        # Every group of up to `capacity` of the orders, as (bitmask, members, duration)
+        groups = {}
+        checked = 0
+        for lead, row in enumerate(mates):
+            for size in range(min(capacity - 1, len(row)) + 1):
+                for chosen in itertools.combinations(row, size):
+                    checked += 1
+                    if not checked % CHECK_EVERY and time.perf_counter() > deadline:
+                        return None
+                    members = sorted((lead,) + chosen)
+                    mask = sum(1 << i for i in members)
+                    if mask not in groups:
+                        groups[mask] = (mask, members, max(durations[i] for i in members))
+        return list(groups.values())
+
+    def _group_cost(self, members, duration, elapsed, arrivals):
+        # Completion time of the group after `elapsed` seconds and the cost it adds
+        finish = elapsed + duration
+        cost = finish * len(members)
+        for i in members:
+            if arrivals[i] is not None and finish > arrivals[i]:
+                cost += self.driver_weight * (finish - arrivals[i])
+        return finish, cost
+
+    def _plan_exact(self, orders, mates, durations, arrivals, capacity, behind, deadline):
+        """First group (as indices) of the cheapest plan for the orders, or None when out of time."""
+        groups = self._feasible_groups(mates, durations, capacity, deadline)
+        if groups is None:
+            return None
+        n = len(orders)
+        # planned orders -> [(elapsed, cost, first group)] with no entry beaten on both elapsed and cost
+        fronts = {0: [(0.0, 0.0, None)]}
+        steps = 0
+        for size in range(n):
+            for planned in [mask for mask in fronts if bin(mask).count('1') == size]:
+                for elapsed, cost, first in fronts.pop(planned):
+                    for mask, members, duration in groups:
+                        steps += 1
+                        if not steps % CHECK_EVERY and time.perf_counter() > deadline:
+                            return None
+                        if mask & planned:
+                            continue
+                        finish, group_cost = self._group_cost(members, duration, elapsed, arrivals)
+                        self._add_to_front(fronts.setdefault(planned | mask, []),
+                                           (finish, cost + group_cost, first or members))
+        best = min(fronts[(1 << n) - 1], key=lambda entry: entry[1] + behind * entry[0])
+        return best[2]
+
+    @staticmethod
+    def _add_to_front(front, entry):
+        for other in front:
+            if other[0] <= entry[0] and other[1] <= entry[1]:
+                return
+        front[:] = [other for other in front if not (entry[0] <= other[0] and entry[1] <= other[1])]
+        front.append(entry)
+
+    def _plan_cost(self, group, rest, durations, arrivals, behind):
+        # The group first, then every other order alone in `rest` order (shortest first)
+        elapsed, total = self._group_cost(group, max(durations[i] for i in group), 0.0, arrivals)
+        for i in rest:
+            elapsed, cost = self._group_cost((i,), durations[i], elapsed, arrivals)
+            total += cost
+        return total + behind * elapsed
+
+    @staticmethod
+    def _lead(roo, orders, members):
+        # A member every other member can be batched with, or None
+        for lead in members:
+            if all(i == lead or roo.dishes_in_common(orders[lead], orders[i]) for i in members):
+                return lead
+        return None
+
+    def _extend(self, roo, orders, group, durations, arrivals, capacity, behind, deadline):
+        rest = sorted((i for i in range(len(orders)) if i not in group), key=durations.__getitem__)
+        best_cost = self._plan_cost(group, rest, durations, arrivals, behind)
+        while len(group) < capacity:
+            best = None
+            for j in rest:
+                if time.perf_counter() > deadline:
+                    return group
+                if self._lead(roo, orders, group + [j]) is None:
+                    continue
+                cost = self._plan_cost(group + [j], [i for i in rest if i != j], durations, arrivals, behind)
+                if cost < best_cost:
+                    best_cost, best = cost, j
+            if best is None:
+                break
+            group = group + [best]
+            rest.remove(best)
+        return group
@@ -0,0 +1,53 @@
+from collections import deque
+
+# Kinds of mutation recorded by ROO
+ADDED = 'added'
+RESCORED = 'rescored'
+BATCHED = 'batched'
+STARTED = 'started'
+PROCESSED = 'processed'
+COMPLETED = 'completed'
+MODIFIED = 'modified'
+CANCELLED = 'cancelled'
+
+class ChangeJournal:
+    """Monotonic version counter plus a bounded journal of the latest mutations.
+
+    Each entry is a (version, kind, order_id) tuple. A RESCORED entry has order_id None
+    because it covers the whole queue.
+
+    Listeners are called with (kind, order) on every mutation, for consumers that must not
+    miss any (see OrderJournal); order is None for RESCORED.
+    """
+
+    def __init__(self, maxlen=1024):
+        self.version = 0
+        self.entries = deque(maxlen=maxlen)
+        self.listeners = []
+
+    def record(self, kind, order_id=None, order=None):
+        self.version += 1
+        self.entries.append((self.version, kind, order_id))
+        if self.listeners:
+            for listener in self.listeners:
+                listener(kind, order)
+        return self.version
+
+    def since(self, version):
+        """Return the entries newer than `version`, oldest first.
+
+        Returns None when older entries have already been dropped from the journal, in which
+        case the caller has to fall back to a full refresh.
+        """
+        if version >= self.version:
+            return []
+        if not self.entries or self.entries[0][0] > version + 1:
+            return None
+        # Walk back from the newest entry so the cost follows the number of changes
+        changes = []
+        for entry in reversed(self.entries):
+            if entry[0] <= version:
+                break
+            changes.append(entry)
+        changes.reverse()
+        return changes
@@ -0,0 +1,112 @@
+import numpy as np
+
+class OrderColumns:
+    """Column-oriented copy of the queued orders used by the vectorized scoring pass."""
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.orders = []
+        self.index = {}  # order_id -> row
+        self.order_time = np.zeros(capacity)
+        self.total_complexity = np.zeros(capacity)
+        self.driver_wait_time = np.zeros(capacity)
+        self.updating_order_driver_time = np.zeros(capacity)
+        self.group = np.zeros(capacity, dtype=bool)
+        self.delivery = np.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self):
+        capacity = 2 * len(self.order_time)
+        for name in ('order_time', 'total_complexity', 'driver_wait_time', 'updating_order_driver_time', 'group', 'delivery'):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def add(self, order):
+        if order.order_id in self.index:
+            self.remove(order.order_id)
+        if self.size == len(self.order_time):
+            self._grow()
+        row = self.size
+        self.size += 1
+        self.orders.append(order)
+        self.index[order.order_id] = row
+        self.refresh(order)
+
+    def refresh(self, order):
+        # Pull the scoring attributes of an order back into its row (e.g. after modify_order)
+        row = self.index[order.order_id]
+        self.order_time[row] = order.order_time
+        self.total_complexity[row] = order.total_complexity
+        self.driver_wait_time[row] = order.driver_wait_time
+        self.updating_order_driver_time[row] = order.updating_order_driver_time
+        self.group[row] = bool(order.group_order_id)
+        self.delivery[row] = order.source != 'In Restaurant'
+
+    def remove(self, order_id):
+        # Swap the last row into the freed one so the live rows stay dense
+        row = self.index.pop(order_id, None)
+        if row is None:
+            return
+        last = self.size - 1
+        if row != last:
+            moved = self.orders[last]
+            self.orders[row] = moved
+            self.index[moved.order_id] = row
+            for column in (self.order_time, self.total_complexity, self.driver_wait_time,
+                           self.updating_order_driver_time, self.group, self.delivery):
+                column[row] = column[last]
+        self.orders.pop()
+        self.size = last
+
+    def score(self, roo, now, hour):
+        """Score every row in one pass, mirroring ROO.calculate_order_priority including its side effects."""
+        n = self.size
+        total_complexity = self.total_complexity[:n]
+        driver_wait_time = self.driver_wait_time[:n]
+        updating = self.updating_order_driver_time[:n]
+        wait_time = now - self.order_time[:n]
+
+        # Consider driver's wait time
+        if roo.driver_weight:
+            delivery = self.delivery[:n]
+            excess = (driver_wait_time - total_complexity) / 100
+            over = delivery & (driver_wait_time > total_complexity)
+            updating[over] += excess[over]
+            wait_time[over] -= excess[over]
+            release = delivery & (updating > 0) & (driver_wait_time < total_complexity)
+            wait_time[release] += updating[release]
+            updating[release] = 0
+            waiting = delivery & (driver_wait_time > 0)
+            driver_wait_time[waiting] -= .05
+
+            # Keep the Order objects in step with the columns for the UI
+            changed = np.flatnonzero(over | release | waiting).tolist()
+            if changed:
+                driver_wait_list = driver_wait_time.tolist()
+                updating_list = updating.tolist()
+                for row in changed:
+                    order = self.orders[row]
+                    order.driver_wait_time = driver_wait_list[row]
+                    order.updating_order_driver_time = updating_list[row]
+
+        if roo.order_group_weight:
+            wait_time[self.group[:n]] *= roo.group_factor
+
+        # Factor for time of day (rush hour)
+        if 12 <= hour <= 14 or 18 <= hour <= 20:
+            wait_time *= roo.rush_hour_factor
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if roo.order_priority_weight:
+                return -1 * wait_time / np.log(total_complexity + 1)
+            return -1 * wait_time / np.exp((1 / total_complexity) + 1)
+
+    def sorted_orders(self, priorities):
+        # Same list of (priority, order) tuples heapq.nsmallest would return
+        ranking = np.argsort(priorities, kind='stable').tolist()
+        priority_list = priorities.tolist()
+        return [(priority_list[row], self.orders[row]) for row in ranking]
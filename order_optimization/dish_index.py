@@ -0,0 +1,140 @@
+from itertools import combinations
+
+from .heap import IndexedHeap
+from .order import popcount
+
+# start_order only batches orders whose smaller dish set is contained in the other one
+# and has at most this many dishes (see ROO.dishes_in_common)
+MAX_SHARED_DISHES = 3
+
+class DishSignatureIndex:
+    """Queued orders bucketed by dish signature (the bitmask of their dishes over the menu).
+
+    Every bucket is a heap with the same priorities as the main queue, so the best candidate
+    of a signature is its top entry. Finding a batch-mate only looks at the tops of the
+    signatures that can share dishes with the order being started. Buckets are kept once
+    created: there are only as many as distinct dish sets on the menu that were ordered.
+    """
+
+    def __init__(self, heap_factory = IndexedHeap, parent = None):
+        # Makes the bucket heaps; ROO passes a KineticHeap factory in kinetic mode
+        self.heap_factory = heap_factory
+        # The main KineticHeap, whose time and rush-hour scale new buckets start from
+        self.parent = parent
+        self.buckets = {}  # signature -> heap
+        self.signatures = {}  # order_id -> signature the order was indexed under
+        self.subsets = {}  # signature -> its subsets with <= MAX_SHARED_DISHES dishes
+        self.supersets = {}  # signature with <= MAX_SHARED_DISHES dishes -> known signatures containing it
+
+    @staticmethod
+    def signature(order):
+        return order.dish_mask
+
+    @staticmethod
+    def small_subsets(signature):
+        bits = [1 << i for i in range(signature.bit_length()) if signature >> i & 1]
+        for size in range(1, min(len(bits), MAX_SHARED_DISHES) + 1):
+            for subset in combinations(bits, size):
+                yield sum(subset)
+
+    def _bucket(self, signature):
+        bucket = self.buckets.get(signature)
+        if bucket is None:
+            bucket = self.buckets[signature] = self.heap_factory()
+            if self.parent is not None and self.parent.now is not None:
+                # Kinetic keys are only comparable between heaps taken at the same time and scale
+                bucket.advance(self.parent.now, self.parent.scale)
+            self.subsets[signature] = tuple(self.small_subsets(signature))
+            for subset in self.subsets[signature]:
+                self.supersets.setdefault(subset, set()).add(signature)
+        return bucket
+
+    def add(self, priority, order):
+        signature = self.signature(order)
+        self._bucket(signature).push(priority, order)
+        self.signatures[order.order_id] = signature
+
+    def remove(self, order_id):
+        signature = self.signatures.pop(order_id, None)
+        if signature is None:
+            return
+        self.buckets[signature].remove(order_id)
+
+    def update(self, order_id, priority):
+        self.buckets[self.signatures[order_id]].update(order_id, priority)
+
+    def load(self, entries):
+        # Index a whole queue at once, e.g. after a restore
+        grouped = {}
+        for entry in entries:
+            signature = entry[1].dish_mask
+            bucket_entries = grouped.get(signature)
+            if bucket_entries is None:
+                grouped[signature] = [entry]
+            else:
+                bucket_entries.append(entry)
+        signatures = self.signatures
+        for signature, bucket_entries in grouped.items():
+            self._bucket(signature).rebuild(bucket_entries)
+            for _, order in bucket_entries:
+                signatures[order.order_id] = signature
+
+    def rebuild(self, entries):
+        # Re-partition the queue after a full rescoring pass. The queued orders are the same,
+        # so their signatures are reused and only the non-empty buckets are touched
+        grouped = {}
+        signatures = self.signatures
+        for entry in entries:
+            signature = signatures[entry[1].order_id]
+            bucket_entries = grouped.get(signature)
+            if bucket_entries is None:
+                grouped[signature] = [entry]
+            else:
+                bucket_entries.append(entry)
+        for signature, bucket_entries in grouped.items():
+            self.buckets[signature].rebuild(bucket_entries)
+
+    def advance(self, now, scale=1.0):
+        # Move every kinetic bucket to `now`; buckets with nothing due return straight away
+        for bucket in self.buckets.values():
+            bucket.advance(now, scale)
+
+    def compatible_signatures(self, signature):
+        # Signatures contained in this one with at most MAX_SHARED_DISHES dishes
+        subsets = self.subsets.get(signature)
+        for subset in subsets if subsets is not None else self.small_subsets(signature):
+            if subset in self.buckets:
+                yield subset
+        # Signatures containing this one, if it is small enough to be shared
+        if popcount(signature) <= MAX_SHARED_DISHES:
+            for superset in self.supersets.get(signature, ()):
+                if superset != signature:
+                    yield superset
+
+    def best_within(self, dish_mask):
+        """Return the highest-priority queued order whose dishes are all in dish_mask, or None."""
+        best = None
+        for signature, bucket in self.buckets.items():
+            if bucket and not signature & ~dish_mask and (best is None or bucket.peek()[0] < best[0]):
+                best = bucket.peek()
+        return None if best is None else best[1]
+
+    def best_match(self, roo, order, priority, threshold, dish_mask = None):
+        """Return the highest-priority queued order start_order may batch with `order`, or None.
+
+        With a dish_mask, candidates must only have dishes from the mask.
+        """
+        best = None
+        for signature in self.compatible_signatures(self.signature(order)):
+            if dish_mask is not None and signature & ~dish_mask:
+                continue
+            for candidate_priority, candidate in self.buckets[signature].iter_sorted():
+                # Entries are in priority order, so the rest of the bucket is outside the band too
+                if roo.priority_closeness(priority, candidate_priority) > threshold:
+                    break
+                if best is not None and candidate_priority >= best[0]:
+                    break
+                if roo.dishes_in_common(order, candidate):
+                    best = (candidate_priority, candidate)
+                    break
+        return None if best is None else best[1]
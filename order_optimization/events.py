@@ -0,0 +1,246 @@
+"""Columnar log of order lifecycle events with rolling service KPIs.
+
+EventLog listens to the ROO change journal and appends one row per transition to
+preallocated NumPy columns, which are sealed into pyarrow record batches when full. Only the
+latest `max_batches` batches are kept. Alongside the log it keeps rolling aggregates over
+the last `window` seconds, updated in constant time per event, so a dashboard or exporter
+reads the KPIs without going through the history.
+"""
+import bisect
+import collections
+import math
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .changes import ADDED, BATCHED, CANCELLED, COMPLETED, MODIFIED, PROCESSED, RESCORED, STARTED
+from .metrics import Histogram
+
+# Upper bounds in seconds of the latency buckets, 10% apart from 0.1s to about 40 hours
+LATENCY_BUCKETS = tuple(0.1 * 1.1 ** i for i in range(150))
+# Event names in the log, in code order
+KINDS = ('queued', 'rescored', 'batched', 'started', 'tick', 'completed', 'modified', 'cancelled')
+KIND_CODES = {ADDED: 0, RESCORED: 1, BATCHED: 2, STARTED: 3, PROCESSED: 4, COMPLETED: 5, MODIFIED: 6, CANCELLED: 7}
+SCHEMA = pa.schema([
+    ('time', pa.float64()), ('kind', pa.dictionary(pa.int8(), pa.string())), ('order_id', pa.int64()),
+    ('source', pa.dictionary(pa.int16(), pa.string())), ('value', pa.float64()),
+])
+
+class RollingHistogram(Histogram):
+    """Histogram of the observations of the last `window` seconds.
+
+    Counts are kept per time slice in a ring of `slices` slices; counts and count hold the
+    totals over the ring, so quantile() and mean work as for a plain Histogram.
+    """
+
+    def __init__(self, buckets, window=3600, slices=60):
+        super().__init__(buckets)
+        self.window = window
+        self.width = window / slices
+        self.ring = [{} for _ in range(slices)]  # bucket index -> count, per slice
+        self.ring_sums = [0.0] * slices
+        self.current = None
+
+    def advance(self, now):
+        # Empty the slices that fell out of the window since the last call
+        slice_id = int(now // self.width)
+        if self.current is None:
+            self.current = slice_id
+        slices = len(self.ring)
+        for expired in range(max(self.current + 1, slice_id - slices + 1), slice_id + 1):
+            position = expired % slices
+            ring = self.ring[position]
+            for i, count in ring.items():
+                self.counts[i] -= count
+                self.count -= count
+            ring.clear()
+            self.sum -= self.ring_sums[position]
+            self.ring_sums[position] = 0.0
+        self.current = max(self.current, slice_id)
+
+    def observe(self, value, now):
+        self.advance(now)
+        position = self.current % len(self.ring)
+        index = bisect.bisect_left(self.buckets, value)
+        ring = self.ring[position]
+        ring[index] = ring.get(index, 0) + 1
+        self.ring_sums[position] += value
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class EventLog:
+    """Append-only, bounded event log of one ROO, with rolling KPIs.
+
+    Every row is (time, kind, order_id, source, value), where value depends on the kind:
+    the priority for queued, the queue length for rescored, the wait until the start for
+    started, the remaining complexity for tick, the prep latency (order to ready) for
+    completed, the new complexity for modified and NaN otherwise. Rescored rows have
+    order_id -1 and no source.
+
+    The rolling KPIs are the p50/p95 prep latency, the mean driver wait per source and the
+    completed orders per hour over the last `window` seconds of the ROO clock. Driver wait
+    times are in minutes, as in ROO; seconds_per_minute converts them to clock seconds.
+    """
+
+    def __init__(self, roo, batch_rows=4096, max_batches=64, window=3600, seconds_per_minute=60):
+        self.roo = roo
+        self.batch_rows = batch_rows
+        self.seconds_per_minute = seconds_per_minute
+        self.batches = collections.deque(maxlen=max_batches)
+        self.dropped_rows = 0
+        self.sources = ['']  # source names by code, 0 for none
+        self.source_codes = {'': 0}
+        self._allocate()
+        self.counts = [0] * len(KINDS)
+        # Its count is also the number of orders completed in the window
+        self.prep_latency = RollingHistogram(LATENCY_BUCKETS, window)
+        self.driver_wait = {}  # source -> RollingHistogram of driver waits
+        self.driver_arrival = {}  # order_id -> clock time the driver arrives
+        self.window = window
+        roo.changes.listeners.append(self._record)
+
+    def close(self):
+        # Stop listening; the log stays readable
+        if self._record in self.roo.changes.listeners:
+            self.roo.changes.listeners.remove(self._record)
+
+    def _allocate(self):
+        rows = self.batch_rows
+        self.time = np.empty(rows, dtype=np.float64)
+        self.kind = np.empty(rows, dtype=np.int8)
+        self.order_id = np.empty(rows, dtype=np.int64)
+        self.source = np.empty(rows, dtype=np.int16)
+        self.value = np.empty(rows, dtype=np.float64)
+        self.rows = 0
+
+    def _batch(self, rows):
+        # Wrap the first `rows` rows of the columns without copying them
+        return pa.RecordBatch.from_arrays([
+            pa.array(self.time[:rows]),
+            pa.DictionaryArray.from_arrays(pa.array(self.kind[:rows]), KINDS),
+            pa.array(self.order_id[:rows]),
+            pa.DictionaryArray.from_arrays(pa.array(self.source[:rows]), self.sources),
+            pa.array(self.value[:rows]),
+        ], schema=SCHEMA)
+
+    def _seal(self):
+        if len(self.batches) == self.batches.maxlen:
+            self.dropped_rows += self.batches[0].num_rows
+        self.batches.append(self._batch(self.rows))
+        self._allocate()
+
+    def _source_code(self, source):
+        code = self.source_codes.get(source)
+        if code is None:
+            code = self.source_codes[source] = len(self.sources)
+            self.sources.append(source)
+        return code
+
+    def _record(self, kind, order):
+        code = KIND_CODES.get(kind)
+        if code is None:
+            return
+        roo = self.roo
+        now = roo.clock()
+        value = math.nan
+        if order is None:
+            order_id, source = -1, 0
+            if kind == RESCORED:
+                value = len(roo.orders)
+        else:
+            order_id, source = order.order_id, self._source_code(order.source)
+            if kind == ADDED:
+                value = roo.orders.priority(order_id)
+                if order.source != 'In Restaurant':
+                    self.driver_arrival[order_id] = order.order_time + roo.driver_wait_time * self.seconds_per_minute
+            elif kind == STARTED:
+                value = now - order.order_time
+            elif kind == PROCESSED:
+                value = order.total_complexity
+            elif kind == COMPLETED:
+                end_time = order.end_time if order.end_time is not None else now
+                value = end_time - order.order_time
+                self.prep_latency.observe(value, now)
+                arrival = self.driver_arrival.pop(order_id, None)
+                if arrival is not None:
+                    waits = self.driver_wait.get(order.source)
+                    if waits is None:
+                        waits = self.driver_wait[order.source] = RollingHistogram(LATENCY_BUCKETS, self.window)
+                    waits.observe(max(0.0, end_time - arrival), now)
+            elif kind == MODIFIED:
+                value = order.total_complexity
+                if order_id in self.driver_arrival:
+                    self.driver_arrival[order_id] = order.order_time + roo.driver_wait_time * self.seconds_per_minute
+            elif kind == CANCELLED:
+                self.driver_arrival.pop(order_id, None)
+
+        row = self.rows
+        self.time[row] = now
+        self.kind[row] = code
+        self.order_id[row] = order_id
+        self.source[row] = source
+        self.value[row] = value
+        self.counts[code] += 1
+        self.rows = row + 1
+        if self.rows == self.batch_rows:
+            self._seal()
+
+    def __len__(self):
+        return sum(batch.num_rows for batch in self.batches) + self.rows
+
+    def record_batches(self):
+        """The sealed record batches followed by the rows of the open one."""
+        batches = list(self.batches)
+        if self.rows:
+            batches.append(self._batch(self.rows))
+        return batches
+
+    def table(self):
+        return pa.Table.from_batches(self.record_batches(), schema=SCHEMA)
+
+    def write_parquet(self, path):
+        # Dictionaries differ between batches as sources get added, so write batch by batch
+        with pq.ParquetWriter(path, SCHEMA) as writer:
+            for batch in self.record_batches():
+                writer.write_batch(batch)
+
+    def kpis(self):
+        """Rolling KPIs over the last `window` seconds, read from the aggregates."""
+        now = self.roo.clock()
+        for histogram in [self.prep_latency, *self.driver_wait.values()]:
+            histogram.advance(now)
+        return {
+            'prep_p50': self.prep_latency.quantile(0.5),
+            'prep_p95': self.prep_latency.quantile(0.95),
+            'completed_per_hour': self.prep_latency.count * 3600 / self.window,
+            'driver_wait_by_source': {source: waits.mean for source, waits in self.driver_wait.items() if waits.count},
+            'events': dict(zip(KINDS, self.counts)),
+        }
+
+    def prometheus_lines(self, kpis=None):
+        """The rolling KPIs (or kpis read earlier) in the Prometheus text format, for RooMetrics.write_prometheus."""
+        if kpis is None:
+            kpis = self.kpis()
+        lines = [
+            '# HELP roo_prep_latency_seconds Time from order to ready over the rolling window.',
+            '# TYPE roo_prep_latency_seconds summary',
+            f'roo_prep_latency_seconds{{quantile="0.5"}} {kpis["prep_p50"]:.6g}',
+            f'roo_prep_latency_seconds{{quantile="0.95"}} {kpis["prep_p95"]:.6g}',
+            '# HELP roo_completed_orders_per_hour Orders completed per hour over the rolling window.',
+            '# TYPE roo_completed_orders_per_hour gauge',
+            f'roo_completed_orders_per_hour {kpis["completed_per_hour"]:.6g}',
+            '# HELP roo_driver_wait_seconds Mean time drivers waited for food over the rolling window.',
+            '# TYPE roo_driver_wait_seconds gauge',
+        ]
+        for source, wait in kpis['driver_wait_by_source'].items():
+            lines.append(f'roo_driver_wait_seconds{{source="{source}"}} {wait:.6g}')
+        lines += [
+            '# HELP roo_lifecycle_events_total Order lifecycle events logged.',
+            '# TYPE roo_lifecycle_events_total counter',
+        ]
+        for kind, count in kpis['events'].items():
+            lines.append(f'roo_lifecycle_events_total{{kind="{kind}"}} {count}')
+        return lines
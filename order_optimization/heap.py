@@ -0,0 +1,134 @@
+import heapq
+from operator import itemgetter
+
+class IndexedHeap:
+    """Binary min-heap of (priority, order) entries that tracks where each order_id sits.
+
+    Entries are compared on priority only, so equal priorities never fall back to comparing
+    Order objects. Iterating or indexing walks the underlying heap array, like the plain list
+    ROO used to keep.
+    """
+
+    def __init__(self, entries=()):
+        self.heap = []
+        self.position = {}  # order_id -> index in self.heap
+        self.rebuild(entries)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __bool__(self):
+        return bool(self.heap)
+
+    def __iter__(self):
+        return iter(self.heap)
+
+    def __getitem__(self, index):
+        return self.heap[index]
+
+    def __contains__(self, order_id):
+        return order_id in self.position
+
+    def get(self, order_id):
+        # Return the queued order with this id, or None
+        index = self.position.get(order_id)
+        return None if index is None else self.heap[index][1]
+
+    def priority(self, order_id):
+        return self.heap[self.position[order_id]][0]
+
+    def rebuild(self, entries):
+        # Replace the content with the entries in priority order (linear when already sorted)
+        self.heap = sorted(entries, key=itemgetter(0))
+        self.position = {order.order_id: i for i, (_, order) in enumerate(self.heap)}
+
+    def push(self, priority, order):
+        if order.order_id in self.position:
+            raise KeyError(f"Order {order.order_id} is already queued")
+        self.heap.append((priority, order))
+        self.position[order.order_id] = len(self.heap) - 1
+        self._sift_up(len(self.heap) - 1)
+
+    def peek(self):
+        return self.heap[0]
+
+    def pop(self):
+        return self._remove_at(0)
+
+    def remove(self, order_id):
+        # Remove an order by id and return its (priority, order) entry, or None if it is not queued
+        index = self.position.get(order_id)
+        if index is None:
+            return None
+        return self._remove_at(index)
+
+    def update(self, order_id, priority):
+        # Change the priority of a queued order (decrease or increase key)
+        index = self.position[order_id]
+        old_priority, order = self.heap[index]
+        self.heap[index] = (priority, order)
+        if priority < old_priority:
+            self._sift_up(index)
+        else:
+            self._sift_down(index)
+
+    def iter_sorted(self):
+        """Yield entries from highest to lowest priority without popping them.
+
+        Walks the heap tree best-first, so looking at the first k entries costs O(k log k).
+        The heap must not be modified while the generator is running.
+        """
+        if not self.heap:
+            return
+        frontier = [(self.heap[0][0], 0)]
+        size = len(self.heap)
+        while frontier:
+            _, index = heapq.heappop(frontier)
+            yield self.heap[index]
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < size:
+                    heapq.heappush(frontier, (self.heap[child][0], child))
+
+    def _remove_at(self, index):
+        entry = self.heap[index]
+        del self.position[entry[1].order_id]
+        last = self.heap.pop()
+        if index < len(self.heap):
+            self.heap[index] = last
+            self.position[last[1].order_id] = index
+            if last[0] < entry[0]:
+                self._sift_up(index)
+            else:
+                self._sift_down(index)
+        return entry
+
+    def _sift_up(self, index):
+        heap = self.heap
+        entry = heap[index]
+        while index > 0:
+            parent = (index - 1) >> 1
+            if heap[parent][0] <= entry[0]:
+                break
+            heap[index] = heap[parent]
+            self.position[heap[index][1].order_id] = index
+            index = parent
+        heap[index] = entry
+        self.position[entry[1].order_id] = index
+
+    def _sift_down(self, index):
+        heap = self.heap
+        size = len(heap)
+        entry = heap[index]
+        while True:
+            child = 2 * index + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1][0] < heap[child][0]:
+                child += 1
+            if entry[0] <= heap[child][0]:
+                break
+            heap[index] = heap[child]
+            self.position[heap[index][1].order_id] = index
+            index = child
+        heap[index] = entry
+        self.position[entry[1].order_id] = index
@@ -0,0 +1,249 @@
+import heapq
+import math
+
+CROSSING = 0
+BREAKPOINT = 1
+
+class KineticHeap:
+    """Min-heap of orders whose keys move linearly with time (see PriorityModel.trajectory).
+
+    The heap is kept valid as of `now`. For every parent/child pair it schedules the time
+    their keys cross, and every order whose key bends has its breakpoint scheduled too.
+    advance(now) only handles the events that fell due, swapping the pairs that crossed, so
+    keeping the queue in order costs O(events) instead of rescoring every order.
+
+    It has the interface of IndexedHeap and entries are read as (priority, order), with the
+    priority taken at `now` and multiplied by `scale` (the rush-hour factor). The priority
+    passed to push and update is ignored: keys always come from the model.
+    """
+
+    def __init__(self, model, entries=()):
+        self.model = model
+        self.heap = []  # orders
+        self.position = {}  # order_id -> index in self.heap
+        self.lines = {}  # order_id -> (slope, intercept) at now
+        self.bends = {}  # order_id -> (breakpoint, slope_after, intercept_after)
+        self.certificates = {}  # order_id -> version of its pending crossing with its parent
+        self.events = []  # (time, sequence, kind, order_id, version)
+        self.sequence = 0
+        self.now = None
+        self.scale = 1.0
+        self.rebuild(entries)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __bool__(self):
+        return bool(self.heap)
+
+    def __iter__(self):
+        return (self._entry(order) for order in self.heap)
+
+    def __getitem__(self, index):
+        return self._entry(self.heap[index])
+
+    def __contains__(self, order_id):
+        return order_id in self.position
+
+    def _key(self, order_id):
+        slope, intercept = self.lines[order_id]
+        return slope * self.now + intercept
+
+    def _entry(self, order):
+        return (self.scale * self._key(order.order_id), order)
+
+    def get(self, order_id):
+        index = self.position.get(order_id)
+        return None if index is None else self.heap[index]
+
+    def priority(self, order_id):
+        return self.scale * self._key(order_id)
+
+    def rebuild(self, entries):
+        self.heap = []
+        self.position = {}
+        self.lines = {}
+        self.bends = {}
+        self.certificates = {}
+        self.events = []
+        for _, order in entries:
+            self.push(None, order)
+
+    def push(self, priority, order):
+        if order.order_id in self.position:
+            raise KeyError(f"Order {order.order_id} is already queued")
+        if self.now is None:
+            self.now = order.order_time
+        self._set_line(order)
+        self.heap.append(order)
+        self.position[order.order_id] = len(self.heap) - 1
+        self._certify_around(self._sift_up(len(self.heap) - 1))
+
+    def peek(self):
+        return self._entry(self.heap[0])
+
+    def pop(self):
+        return self._remove_at(0)
+
+    def remove(self, order_id):
+        index = self.position.get(order_id)
+        if index is None:
+            return None
+        return self._remove_at(index)
+
+    def update(self, order_id, priority=None):
+        # The order changed (dishes or driver wait time), so take its key from the model again
+        index = self.position[order_id]
+        self._set_line(self.heap[index])
+        self._certify_around(self._sift_up(index) + self._sift_down(index))
+
+    def advance(self, now, scale=1.0):
+        """Move the heap to time `now`, handling every crossing and breakpoint due by then."""
+        self.scale = scale
+        if self.now is None:
+            # Nothing pushed yet; keys of the orders pushed later are taken at this time
+            self.now = now
+            return
+        if now <= self.now:
+            return
+        events = self.events
+        while events and events[0][0] <= now:
+            timestamp, _, kind, order_id, version = heapq.heappop(events)
+            if kind == CROSSING:
+                if self.certificates.get(order_id) != version:
+                    continue
+                self.now = timestamp
+                index = self.position[order_id]
+                parent = (index - 1) >> 1
+                self._swap(index, parent)
+                sibling = index + 1 if index & 1 else index - 1
+                self._certify_around([parent, index, sibling])
+            else:
+                bend = self.bends.get(order_id)
+                if bend is None or bend[0] != timestamp:
+                    continue
+                self.now = timestamp
+                del self.bends[order_id]
+                self.lines[order_id] = bend[1:]
+                self._certify_around([self.position[order_id]])
+        self.now = now
+        # Stale events pile up as pairs get re-certified; start over once they dominate
+        if len(events) > 4 * len(self.heap) + 64:
+            self._recertify()
+
+    def iter_sorted(self):
+        """Yield entries from highest to lowest priority without popping them."""
+        if not self.heap:
+            return
+        frontier = [(self._key(self.heap[0].order_id), 0)]
+        size = len(self.heap)
+        while frontier:
+            _, index = heapq.heappop(frontier)
+            yield self._entry(self.heap[index])
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < size:
+                    heapq.heappush(frontier, (self._key(self.heap[child].order_id), child))
+
+    def _set_line(self, order):
+        slope, intercept, breakpoint, slope_after, intercept_after = self.model.trajectory(order)
+        order_id = order.order_id
+        if breakpoint <= self.now:
+            self.lines[order_id] = (slope_after, intercept_after)
+            self.bends.pop(order_id, None)
+        else:
+            self.lines[order_id] = (slope, intercept)
+            if breakpoint < math.inf:
+                self.bends[order_id] = (breakpoint, slope_after, intercept_after)
+                self._schedule(breakpoint, BREAKPOINT, order_id, 0)
+            else:
+                self.bends.pop(order_id, None)
+
+    def _schedule(self, timestamp, kind, order_id, version):
+        heapq.heappush(self.events, (timestamp, self.sequence, kind, order_id, version))
+        self.sequence += 1
+
+    def _certify(self, index):
+        # Schedule when the order at index overtakes its parent, if it ever does before its next bend
+        order_id = self.heap[index].order_id
+        version = self.certificates.get(order_id, 0) + 1
+        self.certificates[order_id] = version
+        if index == 0:
+            return
+        parent_id = self.heap[(index - 1) >> 1].order_id
+        slope, intercept = self.lines[order_id]
+        parent_slope, parent_intercept = self.lines[parent_id]
+        if slope < parent_slope:
+            crossing = max(self.now, (intercept - parent_intercept) / (parent_slope - slope))
+            self._schedule(crossing, CROSSING, order_id, version)
+
+    def _certify_around(self, indices):
+        # Re-certify the orders at these indices and their children, whose parents may have changed
+        size = len(self.heap)
+        done = set()
+        for index in indices:
+            for i in (index, 2 * index + 1, 2 * index + 2):
+                if i < size and i not in done:
+                    done.add(i)
+                    self._certify(i)
+
+    def _recertify(self):
+        self.events = []
+        for order_id, (breakpoint, _, _) in self.bends.items():
+            self._schedule(breakpoint, BREAKPOINT, order_id, 0)
+        for index in range(len(self.heap)):
+            self._certify(index)
+
+    def _swap(self, i, j):
+        heap = self.heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self.position[heap[i].order_id] = i
+        self.position[heap[j].order_id] = j
+
+    def _remove_at(self, index):
+        order = self.heap[index]
+        entry = self._entry(order)
+        order_id = order.order_id
+        del self.position[order_id]
+        del self.lines[order_id]
+        self.bends.pop(order_id, None)
+        self.certificates.pop(order_id, None)
+        last = self.heap.pop()
+        if index < len(self.heap):
+            self.heap[index] = last
+            self.position[last.order_id] = index
+            self._certify_around(self._sift_up(index) + self._sift_down(index))
+        return entry
+
+    def _sift_up(self, index):
+        # Returns the indices whose order changed
+        moved = [index]
+        key = self._key(self.heap[index].order_id)
+        while index > 0:
+            parent = (index - 1) >> 1
+            if self._key(self.heap[parent].order_id) <= key:
+                break
+            self._swap(index, parent)
+            index = parent
+            moved.append(index)
+        return moved
+
+    def _sift_down(self, index):
+        moved = [index]
+        heap = self.heap
+        size = len(heap)
+        key = self._key(heap[index].order_id)
+        while True:
+            child = 2 * index + 1
+            if child >= size:
+                break
+            child_key = self._key(heap[child].order_id)
+            if child + 1 < size:
+                right_key = self._key(heap[child + 1].order_id)
+                if right_key < child_key:
+                    child, child_key = child + 1, right_key
+            if key <= child_key:
+                break
+            self._swap(index, child)
+            index = child
+            moved.append(index)
+        return moved
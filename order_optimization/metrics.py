@@ -0,0 +1,201 @@
+import bisect
+import functools
+import os
+import time
+
+# Upper bounds in seconds of the histogram buckets
+LATENCY_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0, 5.0)
+WAIT_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q):
+        # Estimate by linear interpolation inside the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def prometheus_lines(self, name, labels=''):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}le="{bound:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {self.count}')
+        labels = f'{{{labels.rstrip(",")}}}' if labels else ''
+        lines.append(f'{name}_sum{labels} {self.sum:.9g}')
+        lines.append(f'{name}_count{labels} {self.count}')
+        return lines
+
+
+class RooMetrics:
+    """Opt-in instrumentation of a ROO instance.
+
+    attach() replaces the hot-path methods of that one instance with timed wrappers, so an
+    uninstrumented ROO runs exactly the same code as before. Besides per-method latency it
+    tracks batch hits, duplicate adds, the time from order to first start and how long
+    drivers wait for food once they arrive. Driver wait times are in minutes (as in the
+    dashboard); seconds_per_minute converts them to clock seconds.
+    """
+
+    METHODS = ('add_order', 'optimize_orders', 'take_group', 'start_order', 'modify_order', 'cancel_order',
+               'process_order', 'process_group', 'complete_order')
+
+    def __init__(self, roo, seconds_per_minute=60):
+        self.roo = roo
+        self.seconds_per_minute = seconds_per_minute
+        self.latency = {name: Histogram(LATENCY_BUCKETS) for name in self.METHODS}
+        self.time_to_start = Histogram(WAIT_BUCKETS)
+        self.driver_idle = Histogram(WAIT_BUCKETS)
+        self.groups_started = 0
+        self.batched_groups = 0
+        self.duplicate_orders = 0
+        self.driver_arrival = {}  # order_id -> clock time the driver arrives
+
+    @property
+    def batch_hit_rate(self):
+        return self.batched_groups / self.groups_started if self.groups_started else 0.0
+
+    def summary(self):
+        # The figures the dashboard shows, read in one go so a caller can take them under its lock
+        optimize = self.latency['optimize_orders']
+        return {
+            'queue_length': len(self.roo.orders),
+            'batch_hit_rate': self.batch_hit_rate,
+            'time_to_start': self.time_to_start.mean,
+            'driver_idle': self.driver_idle.mean,
+            'duplicate_orders': self.duplicate_orders,
+            'groups_started': self.groups_started,
+            'optimize_p50': optimize.quantile(0.5),
+            'optimize_p95': optimize.quantile(0.95),
+        }
+
+    def attach(self):
+        for name in self.METHODS:
+            setattr(self.roo, name, self._timed(name, getattr(self.roo, name)))
+        self.roo.metrics = self
+        return self
+
+    def detach(self):
+        for name in self.METHODS:
+            self.roo.__dict__.pop(name, None)
+        self.roo.metrics = None
+
+    def _timed(self, name, method):
+        histogram = self.latency[name]
+        before = getattr(self, f'_before_{name}', None)
+        after = getattr(self, f'_after_{name}', None)
+        perf_counter = time.perf_counter
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            context = before(*args, **kwargs) if before is not None else None
+            started = perf_counter()
+            result = method(*args, **kwargs)
+            histogram.observe(perf_counter() - started)
+            if after is not None:
+                after(result, context)
+            return result
+        return timed
+
+    def _before_add_order(self, order):
+        if order.order_id in self.roo.orders:
+            self.duplicate_orders += 1
+        elif order.source != 'In Restaurant':
+            # Read before scoring, which counts driver_wait_time down
+            self.driver_arrival[order.order_id] = order.order_time + order.driver_wait_time * self.seconds_per_minute
+
+    def _after_take_group(self, group, context):
+        if not group:
+            return
+        now = self.roo.clock()
+        self.groups_started += 1
+        if len(group) > 1:
+            self.batched_groups += 1
+        for order in group:
+            self.time_to_start.observe(now - order.order_time)
+
+    def _before_complete_order(self, order_id):
+        return order_id if self.roo.current_order and any(order.order_id == order_id for order in self.roo.current_order) else None
+
+    def _after_complete_order(self, result, order_id):
+        arrival = self.driver_arrival.pop(order_id, None) if order_id is not None else None
+        if arrival is not None:
+            self.driver_idle.observe(max(0.0, self.roo.clock() - arrival))
+
+    def _after_cancel_order(self, order, context):
+        if order is not None:
+            self.driver_arrival.pop(order.order_id, None)
+
+    def to_prometheus(self, extra_lines=()):
+        """Render the metrics in the Prometheus text exposition format, followed by extra_lines."""
+        roo = self.roo
+        lines = [
+            '# HELP roo_method_latency_seconds Latency of ROO methods.',
+            '# TYPE roo_method_latency_seconds histogram',
+        ]
+        for name, histogram in self.latency.items():
+            lines.extend(histogram.prometheus_lines('roo_method_latency_seconds', f'method="{name}",'))
+        lines += [
+            '# HELP roo_queue_length Orders waiting in the queue.',
+            '# TYPE roo_queue_length gauge',
+            f'roo_queue_length {len(roo.orders)}',
+            '# HELP roo_orders_in_progress Orders being prepared.',
+            '# TYPE roo_orders_in_progress gauge',
+            f'roo_orders_in_progress {len(roo.current_order) if roo.current_order else 0}',
+            '# HELP roo_groups_started_total Groups of orders started.',
+            '# TYPE roo_groups_started_total counter',
+            f'roo_groups_started_total {self.groups_started}',
+            '# HELP roo_batched_groups_total Started groups that found a batch-mate.',
+            '# TYPE roo_batched_groups_total counter',
+            f'roo_batched_groups_total {self.batched_groups}',
+            '# HELP roo_batch_hit_ratio Share of started groups that found a batch-mate.',
+            '# TYPE roo_batch_hit_ratio gauge',
+            f'roo_batch_hit_ratio {self.batch_hit_rate:.6g}',
+            '# HELP roo_duplicate_orders_total Orders skipped because their id was already queued.',
+            '# TYPE roo_duplicate_orders_total counter',
+            f'roo_duplicate_orders_total {self.duplicate_orders}',
+            '# HELP roo_time_to_first_start_seconds Time from order to the start of its preparation.',
+            '# TYPE roo_time_to_first_start_seconds histogram',
+        ]
+        lines.extend(self.time_to_start.prometheus_lines('roo_time_to_first_start_seconds'))
+        lines += [
+            '# HELP roo_driver_idle_seconds Time drivers waited for a completed order after arriving.',
+            '# TYPE roo_driver_idle_seconds histogram',
+        ]
+        lines.extend(self.driver_idle.prometheus_lines('roo_driver_idle_seconds'))
+        lines.extend(extra_lines)
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path, extra_lines=()):
+        write_prometheus_text(path, self.to_prometheus(extra_lines))
+
+
+def write_prometheus_text(path, text):
+    # Write next to the target and rename, so a scraper never reads a half-written file
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as f:
+        f.write(text)
+    os.replace(temporary, path)
@@ -0,0 +1,112 @@
+class Menu:
+    """Registry of the dishes that have been created.
+
+    Each distinct (name, complexity) pair is stored once and gets its own bit, so the dishes
+    of an order can be kept as an integer mask over the menu.
+    """
+
+    def __init__(self):
+        self.dishes = {}  # (name, complexity) -> Dish
+        self.by_bit = []  # Dish by bit position
+        self.by_name = {}  # name -> Dish, the first registered with that name
+
+    def __len__(self):
+        return len(self.by_bit)
+
+    def __iter__(self):
+        return iter(self.by_bit)
+
+    def dish(self, name, complexity):
+        # Return the interned dish, registering it on first use
+        dish = self.dishes.get((name, complexity))
+        if dish is None:
+            dish = object.__new__(Dish)
+            dish.name = name
+            dish.complexity = complexity
+            dish.bit = 1 << len(self.by_bit)
+            self.dishes[(name, complexity)] = dish
+            self.by_bit.append(dish)
+            # A later dish with the same name and another complexity must not change what
+            # the name resolves to for orders coming from outside
+            self.by_name.setdefault(name, dish)
+        return dish
+
+    def named(self, name):
+        # Look a dish up by name alone, for orders coming from outside; None if it is not on the menu
+        return self.by_name.get(name)
+
+    def dishes_of(self, mask):
+        return [dish for dish in self.by_bit if dish.bit & mask]
+
+menu = Menu()
+
+def popcount(mask):
+    # int.bit_count needs Python 3.10
+    return bin(mask).count("1")
+
+class Dish:
+    __slots__ = ('name', 'complexity', 'bit')
+
+    def __new__(cls, name, complexity):
+        # Dishes are interned: the same name and complexity always give the same object
+        return menu.dish(name, complexity)
+
+    def __reduce__(self):
+        # Copies and unpickled dishes resolve to the interned instance
+        return (Dish, (self.name, self.complexity))
+
+class Order:
+    __slots__ = ('order_id', 'order_time', '_dishes', 'dish_mask', 'dish_complexity', 'total_complexity',
+                 'group_order_id', 'source', 'driver_wait_time', 'updating_order_driver_time', 'start_time', 'end_time')
+
+    def __init__(self, order_id, order_time, dishes, source, driver_wait_time):
+        self.order_id = order_id
+        self.order_time = order_time
+        self.dishes = dishes
+        self.total_complexity = self.dish_complexity
+        self.group_order_id = True if len(dishes) > 3 else False
+        self.source = source
+
+        if self.source == 'In Restaurant':
+            self.driver_wait_time = 0
+        else:
+            self.driver_wait_time = driver_wait_time
+
+        self.updating_order_driver_time = 0
+        self.start_time = None
+        self.end_time = None
+
+    @property
+    def dishes(self):
+        return self._dishes
+
+    @dishes.setter
+    def dishes(self, dishes):
+        # Keep the dish bitmask and the summed complexity of the dishes next to the tuple
+        self._dishes = tuple(dishes)
+        mask = 0
+        complexity = 0
+        for dish in self._dishes:
+            mask |= dish.bit
+            complexity += dish.complexity
+        self.dish_mask = mask
+        self.dish_complexity = complexity
+
+    def get_feature_vector(self):
+        # For simplicity, let's encode order source as an integer
+        source_encoding = 0
+        if self.source == 'Bolt Foods':
+            source_encoding = 1
+        elif self.source == 'UberEats':
+            source_encoding = 2
+        elif self.source == 'Glovo':
+            source_encoding = 3
+
+        # Total complexity of dishes, summed once when the dishes were set
+        total_complexity = self.dish_complexity
+
+        # Driver wait time
+        wait_time = self.driver_wait_time
+
+        # Return feature vector as a list
+        return [source_encoding, total_complexity, wait_time]
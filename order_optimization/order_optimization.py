@@ -1,19 +1,79 @@
+import functools
 import time
-import heapq
 import math
 
+from .changes import ADDED, BATCHED, CANCELLED, COMPLETED, MODIFIED, PROCESSED, RESCORED, STARTED, ChangeJournal
+from .columns import OrderColumns
+from .dish_index import DishSignatureIndex
+from .heap import IndexedHeap
+from .kinetic import KineticHeap
+from .metrics import RooMetrics
+from .order import popcount
+from .priority import PriorityModel
+
 class ROO:
 
-    def __init__(self, driver_weight, order_group_weight, order_priority_weight, buffer_time_percentage = 0.1):
-        self.orders = []
+    def __init__(self, driver_weight, order_group_weight, order_priority_weight, buffer_time_percentage = 0.1, vectorized = False, clock = time.time, journal_size = 1024, kinetic = False, seconds_per_minute = 60, group_factor = 1.1, rush_hour_factor = 1.1, batcher = None):
+        # The priority formula as a pure function of (order, now), used in kinetic mode
+        self.model = PriorityModel(driver_weight, order_group_weight, order_priority_weight, seconds_per_minute,
+                                   group_factor, rush_hour_factor)
+        self.kinetic = kinetic
+        if kinetic:
+            # Keys move linearly with time, so optimize_orders only handles the crossings that fell due
+            heap_factory = functools.partial(KineticHeap, self.model)
+        else:
+            heap_factory = IndexedHeap
+        # Addressable heap of (priority, order) entries, indexed by order_id
+        self.orders = heap_factory()
+        # The same orders bucketed by dish signature, used to find batch-mates in start_order
+        self.dish_index = DishSignatureIndex(heap_factory, self.orders if kinetic else None)
         self.current_order = None
         self.buffer_time_percentage = buffer_time_percentage
         self.driver_weight = driver_weight
         self.order_group_weight = order_group_weight
         self.order_priority_weight = order_priority_weight
+        # Multipliers of the waiting time of group orders and of orders scored in rush hour
+        self.group_factor = group_factor
+        self.rush_hour_factor = rush_hour_factor
+        # Source of the current time in seconds; simulations pass a virtual clock
+        self.clock = clock
+        # Clock time the latest priorities were taken at, which OrderJournal writes next to them
+        self.scored_at = None
+        # driver_wait_time of the order being added or modified, read before scoring counts it down
+        self.driver_wait_time = None
+        # Keep the queue in NumPy columns and rescore it in one pass in optimize_orders (kinetic mode never rescores)
+        self.columns = OrderColumns() if vectorized and not kinetic else None
+        # Version counter and recent mutations, so consumers can refresh only what changed
+        self.changes = ChangeJournal(journal_size)
+        # Optional LookaheadBatcher that plans groups over a window of top orders instead of greedy pairing
+        self.batcher = batcher
+        # Set by enable_metrics; an uninstrumented ROO pays nothing for it
+        self.metrics = None
+
+    @property
+    def version(self):
+        return self.changes.version
+
+    def changes_since(self, version):
+        # (version, kind, order_id) entries newer than `version`, or None if a full refresh is needed
+        return self.changes.since(version)
+
+    def enable_metrics(self, seconds_per_minute = 60):
+        # Time the hot-path methods of this instance and track batching and waiting times
+        if self.metrics is None:
+            RooMetrics(self, seconds_per_minute).attach()
+        return self.metrics
 
-    def calculate_order_priority(self, order):
-        wait_time = time.time() - order.order_time
+    def disable_metrics(self):
+        if self.metrics is not None:
+            self.metrics.detach()
+
+    def calculate_order_priority(self, order, now = None):
+        if now is None:
+            now = self.scored_at = self.clock()
+        if self.kinetic:
+            return self.model.priority(order, now)
+        wait_time = now - order.order_time
         
         # Consider driver's wait time
         if order.source != 'In Restaurant' and self.driver_weight:
@@ -27,14 +87,14 @@ class ROO:
                 order.driver_wait_time -= .05
                 
         if order.group_order_id and self.order_group_weight:
-            wait_time *= 1.1  # 1% more priority for group orders
+            wait_time *= self.group_factor  # 10% more priority for group orders by default
             
         #buffer_time = order.total_complexity * self.buffer_time_percentage
 
         # Factor for time of day (rush hour)
-        current_hour = time.localtime().tm_hour
+        current_hour = time.localtime(now).tm_hour
         if 12 <= current_hour <= 14 or 18 <= current_hour <= 20:  # peak hours
-            wait_time *= 1.1
+            wait_time *= self.rush_hour_factor
             
         if self.order_priority_weight:
             priority = -1 * (wait_time) / math.log(order.total_complexity + 1)
@@ -44,7 +104,16 @@ class ROO:
     
     
     def add_order(self, order):
-        heapq.heappush(self.orders, (self.calculate_order_priority(order), order))
+        if order.order_id in self.orders:
+            print(f"Order {order.order_id} is already in the list, skipping...")
+            return
+        self.driver_wait_time = order.driver_wait_time
+        priority = self.calculate_order_priority(order)
+        self.orders.push(priority, order)
+        self.dish_index.add(priority, order)
+        if self.columns is not None:
+            self.columns.add(order)
+        self.changes.record(ADDED, order.order_id, order)
 
     def priority_closeness(self, priority1, priority2):
         # This could be as simple as taking the absolute difference between their priorities
@@ -52,46 +121,66 @@ class ROO:
 
     def dishes_in_common(self, order1, order2):
         # This checks if the intersection of their sets of dishes is non-empty and not more than 3
-        common_dishes = len(set(order1.dishes) & set(order2.dishes))
+        common_dishes = popcount(order1.dish_mask & order2.dish_mask)
         if len(order1.dishes) > len(order2.dishes):
             min_len_order = len(order2.dishes)
         else:
             min_len_order = len(order1.dishes)
         return 0 < common_dishes <= 3 and common_dishes == min_len_order
     
-    def start_order(self, threshold = 2):
-        if self.orders and not self.current_order:
-            # Start with the highest priority order
-            priority, order = heapq.heappop(self.orders)
+    def take_group(self, threshold = 2, capacity = 2, dish_mask = None):
+        """Take the highest-priority order off the queue together with up to capacity - 1 batch-mates.
+
+        With a dish_mask only orders whose dishes are all in the mask are considered, for
+        kitchen stations that only cook part of the menu. Returns the group, or an empty list
+        when nothing fits. With a batcher the batcher picks the group instead, and the greedy
+        pairing only runs when it gives up.
+        """
+        group_orders = self.batcher.choose(self, capacity, dish_mask) if self.batcher is not None else None
+        if group_orders is not None:
+            for started_order in group_orders:
+                self.orders.remove(started_order.order_id)
+                self.dish_index.remove(started_order.order_id)
+        else:
+            if dish_mask is None:
+                if not self.orders:
+                    return []
+                # Start with the highest priority order
+                priority, order = self.orders.pop()
+            else:
+                order = self.dish_index.best_within(dish_mask)
+                if order is None:
+                    return []
+                priority, order = self.orders.remove(order.order_id)
+            self.dish_index.remove(order.order_id)
 
             # Create a group of orders, starting with the highest priority one
             group_orders = [order]
 
-            # Create a new list to hold orders that we'll put back in the heap later
-            leftover_orders = []
-
-            while self.orders:
-                potential_priority, potential_order = heapq.heappop(self.orders)
-                if self.priority_closeness(priority, potential_priority) <= threshold and self.dishes_in_common(order, potential_order):
-                    # Add this order to the group
-                    group_orders.append(potential_order)
+            # Only orders with a compatible dish signature inside the threshold band can join
+            while len(group_orders) < capacity:
+                potential_order = self.dish_index.best_match(self, order, priority, threshold, dish_mask)
+                if potential_order is None:
                     break
+                # Add this order to the group
+                group_orders.append(potential_order)
+                self.orders.remove(potential_order.order_id)
+                self.dish_index.remove(potential_order.order_id)
 
-                else:
-                    # This order doesn't meet the criteria, so we'll put it back later
-                    leftover_orders.append((potential_priority, potential_order))
-                    
-            # Put the leftover orders back in the heap
-            for leftover_order in leftover_orders:
-                # Check if the order_id of the leftover_order is not already present in the self.orders
-                order_ids = [order.order_id for _, order in self.orders]
-                if leftover_order[1].order_id not in order_ids:
-                    heapq.heappush(self.orders, leftover_order)
-                else:
-                    print(f"Order {leftover_order[1].order_id} is already in the list, skipping...")
+        now = self.clock()
+        for started_order in group_orders:
+            if self.columns is not None:
+                self.columns.remove(started_order.order_id)
+            started_order.start_time = now
+            if len(group_orders) > 1:
+                self.changes.record(BATCHED, started_order.order_id, started_order)
+            self.changes.record(STARTED, started_order.order_id, started_order)
+        return group_orders
 
+    def start_order(self, threshold = 2):
+        if self.orders and not self.current_order:
             # Start the group of orders
-            self.current_order = group_orders
+            self.current_order = self.take_group(threshold, self.batcher.capacity if self.batcher is not None else 2)
 
     def process_order(self, choose_order = None):
         # Get the order with the highest total complexity
@@ -100,9 +189,17 @@ class ROO:
         # Process one unit of complexity per time unit
         if max_complexity_order.total_complexity > 0:
             max_complexity_order.total_complexity -= 1
+            self.changes.record(PROCESSED, max_complexity_order.order_id, max_complexity_order)
         else:
             self.complete_order(max_complexity_order.order_id)
 
+    def process_group(self):
+        # Process one unit of complexity of every order in progress, for a kitchen that cooks the group side by side
+        for order in self.current_order or []:
+            if order.total_complexity > 0:
+                order.total_complexity -= 1
+                self.changes.record(PROCESSED, order.order_id, order)
+
     def complete_order(self, order_id):
         # Get the order from current_order list with given order_id
         completed_order = next((order for order in self.current_order if order.order_id == order_id), None)
@@ -110,26 +207,73 @@ class ROO:
         if completed_order:
             # Remove the completed order from the current_order list
             self.current_order.remove(completed_order)
+            # A KitchenExecutor has already set the end time it planned for the order
+            if completed_order.end_time is None:
+                completed_order.end_time = self.clock()
+            self.changes.record(COMPLETED, order_id, completed_order)
             
     def optimize_orders(self):
-        self.orders = [(self.calculate_order_priority(order_obj), order_obj) for _, order_obj in self.orders]
-        # Re-heapify orders
-        heapq.heapify(self.orders)
-
-        # If you want to get all orders in sorted order (from highest to lowest priority), you can use heapq.nsmallest:
-        self.orders = heapq.nsmallest(len(self.orders), self.orders)
+        if self.kinetic:
+            # Only the pairs of orders whose priorities crossed since the last call move
+            now = self.scored_at = self.clock()
+            scale = self.model.rush_multiplier(now)
+            self.orders.advance(now, scale)
+            self.dish_index.advance(now, scale)
+            self.changes.record(RESCORED)
+            return
+        # Sample the clock once for the whole pass
+        now = self.scored_at = self.clock()
+        if self.columns is not None:
+            priorities = self.columns.score(self, now, time.localtime(now).tm_hour)
+            self.orders.rebuild(self.columns.sorted_orders(priorities))
+        else:
+            # Rescore every order and keep the queue fully sorted, highest priority first
+            self.orders.rebuild([(self.calculate_order_priority(order_obj, now), order_obj) for _, order_obj in self.orders])
+        self.dish_index.rebuild(self.orders)
+        self.changes.record(RESCORED)
 
     def modify_order(self, order_id, new_dishes=None, driver_wait_time=None):
         # Find the order
-        for i in range(len(self.orders)):
-            if self.orders[i][1].order_id == order_id:
-                if new_dishes is not None:
-                    # Update dishes and total complexity
-                    self.orders[i][1].dishes = new_dishes
-                    self.orders[i][1].total_complexity = sum(dish.complexity for dish in new_dishes)
-                if driver_wait_time is not None:
-                    # Update driver wait time
-                    self.orders[i][1].driver_wait_time = driver_wait_time
-                break
-        # Re-optimize orders after modification
-        self.optimize_orders()
+        order = self.orders.get(order_id)
+        if order is None:
+            return
+        if new_dishes is not None:
+            # Update dishes and total complexity
+            order.dishes = new_dishes
+            order.total_complexity = order.dish_complexity
+        if driver_wait_time is not None:
+            # Update driver wait time
+            order.driver_wait_time = driver_wait_time
+        self.driver_wait_time = order.driver_wait_time
+        # Re-score only the modified order and move it to its new place in the heap
+        priority = self.calculate_order_priority(order)
+        self.orders.update(order_id, priority)
+        # The dishes may have changed, so index the order under its current signature
+        self.dish_index.remove(order_id)
+        self.dish_index.add(priority, order)
+        if self.columns is not None:
+            self.columns.refresh(order)
+        self.changes.record(MODIFIED, order_id, order)
+
+    def cancel_order(self, order_id):
+        # Remove a queued order, returning it or None if it is not in the queue
+        entry = self.orders.remove(order_id)
+        if entry is None:
+            return None
+        self.dish_index.remove(order_id)
+        if self.columns is not None:
+            self.columns.remove(order_id)
+        self.changes.record(CANCELLED, order_id, entry[1])
+        return entry[1]
+
+    def load(self, entries, current_order = None):
+        """Replace the queue with (priority, order) entries and the orders in progress, e.g. from a snapshot."""
+        self.orders.rebuild(entries)
+        self.dish_index = DishSignatureIndex(self.dish_index.heap_factory, self.dish_index.parent)
+        self.dish_index.load(self.orders)
+        if self.columns is not None:
+            self.columns = OrderColumns()
+            for _, order in self.orders:
+                self.columns.add(order)
+        self.current_order = list(current_order) if current_order else None
+        self.changes.record(RESCORED)
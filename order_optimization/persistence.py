@@ -0,0 +1,449 @@
+"""Durable ROO state: periodic snapshots plus an append-only journal of the changes since.
+
+A directory holds generations of snapshot-NNNNNNNN.snap and journal-NNNNNNNN.log. The
+snapshot is a JSON header (dish, dish set and source tables) followed by one fixed-size NumPy
+record per queued or in-progress order, so restoring memory-maps it instead of parsing it.
+The journal holds one fixed-size binary record per add, modify, start, process, complete,
+cancel or rescoring pass that happened after the snapshot; restore replays only that tail.
+
+Added and modified orders are written with the priority they were given, so replaying them
+never rescores an order at the restore time. A rescoring pass is written as the clock time
+it ran at and replayed by running it again at that time, which counts the driver wait
+times down exactly as it did before.
+
+    journal = OrderJournal('state/')
+    journal.restore(roo)     # nothing happens on the first run
+    journal.attach(roo)      # snapshot now, then journal every change
+    ...
+    journal.flush()          # at the points the caller wants to be durable
+    journal.maybe_snapshot()
+"""
+import contextlib
+import gc
+import itertools
+import json
+import math
+import os
+import re
+import struct
+
+import numpy as np
+
+from .changes import ADDED, CANCELLED, COMPLETED, MODIFIED, PROCESSED, RESCORED, STARTED
+from .order import Dish, Order, menu
+
+MAGIC = b'ROOSNAP3'
+
+# Dish masks can be wider than 64 bits, so records refer to an entry of the dish set table
+SNAPSHOT_DTYPE = np.dtype([
+    ('order_id', '<i8'), ('order_time', '<f8'), ('dish_set', '<u4'), ('total_complexity', '<i8'),
+    ('source', '<u4'), ('driver_wait_time', '<f8'), ('updating_order_driver_time', '<f8'),
+    ('start_time', '<f8'), ('end_time', '<f8'), ('group', '?'), ('priority', '<f8'), ('in_progress', '?'),
+])
+
+# kind, order_id, order_time, dish_set, total_complexity, source, driver_wait_time,
+# updating_order_driver_time, start_time, end_time, group_order_id, priority, scored_at
+# (the clock time of the priority, or of the pass for a RESCORED record)
+RECORD = struct.Struct('<BqdIqIdddd?dd')
+
+# Record kinds in the journal; DISH, SOURCE and DISH_SET declare an entry of the dish, source
+# or dish set table and are followed by its UTF-8 name or the little-endian bytes of its mask
+KIND_CODES = {ADDED: 1, MODIFIED: 2, STARTED: 3, PROCESSED: 4, COMPLETED: 5, CANCELLED: 6, RESCORED: 7}
+KINDS = {code: kind for kind, code in KIND_CODES.items()}
+DISH = 10
+SOURCE = 11
+DISH_SET = 12
+
+GENERATION = re.compile(r'snapshot-(\d{8})\.snap$')
+
+def _time(value):
+    return math.nan if value is None else value
+
+def _optional(value):
+    return None if math.isnan(value) else value
+
+def _mask_bytes(mask):
+    return mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+
+def _rescore_at(roo, now):
+    # Run an optimize_orders pass as if the clock read `now`
+    clock = roo.clock
+    roo.clock = lambda: now
+    try:
+        roo.optimize_orders()
+    finally:
+        roo.clock = clock
+
+@contextlib.contextmanager
+def _paused_gc():
+    # Building or dumping a whole queue at once sets off collections that find nothing to free
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if collecting:
+            gc.enable()
+
+def _build_order(order_id, order_time, decoded, source, driver_wait_time, updating_order_driver_time,
+                 total_complexity, group_order_id):
+    # Order.__init__ without recomputing the dishes and without resetting state a journaled order
+    # already has (its driver wait time may have been modified, its complexity processed)
+    order = Order.__new__(Order)
+    order.order_id = order_id
+    order.order_time = order_time
+    order._dishes, order.dish_mask, order.dish_complexity = decoded
+    order.total_complexity = total_complexity
+    order.group_order_id = group_order_id
+    order.source = source
+    order.driver_wait_time = driver_wait_time
+    order.updating_order_driver_time = updating_order_driver_time
+    order.start_time = None
+    order.end_time = None
+    return order
+
+
+class OrderJournal:
+    """Snapshots and journal of one ROO instance, kept in `directory`.
+
+    Records are buffered and written out once `buffer_size` bytes have built up or on
+    flush(), with an fsync when `fsync` is set. maybe_snapshot() starts a new generation
+    after `snapshot_every` records, or once the journaled rescoring passes add up to
+    `rescore_every` order scorings, which restore would otherwise have to redo. Each distinct dish bitmask of this process
+    is stored once, at any width, together with a table of the dish behind each bit, so
+    another process with a different menu order restores the same dishes.
+
+    Order ids must be integers. Only ROO's own state is kept: the stations of a
+    KitchenExecutor have to be refilled from roo.current_order after a restore.
+    """
+
+    def __init__(self, directory, snapshot_every=50_000, rescore_every=500_000, buffer_size=1 << 16, fsync=False,
+                 keep=2):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.rescore_every = rescore_every
+        self.buffer_size = buffer_size
+        self.fsync = fsync
+        self.keep = keep
+        self.roo = None
+        self.generation = 0
+        self.file = None
+        self.buffer = bytearray()
+        self.records = 0  # records written since the last snapshot
+        self.rescored = 0  # orders scored by the rescoring passes written since the last snapshot
+        self.dish_bits = 0  # bits of the dishes declared in the current generation
+        self.dish_sets = {}  # dish mask -> index declared in the current generation
+        self.sources = {}  # source -> index declared in the current generation
+        # Highest order id snapshotted, journaled or restored, so new ids do not reuse finished orders' ids
+        self.last_order_id = -1
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, kind, generation):
+        extension = 'snap' if kind == 'snapshot' else 'log'
+        return os.path.join(self.directory, f'{kind}-{generation:08d}.{extension}')
+
+    def generations(self):
+        found = (GENERATION.match(name) for name in os.listdir(self.directory))
+        return sorted(int(match.group(1)) for match in found if match)
+
+    def attach(self, roo):
+        """Snapshot roo as it is and journal every change it makes from now on."""
+        self.roo = roo
+        generations = self.generations()
+        self.generation = generations[-1] if generations else 0
+        self.snapshot()
+        roo.changes.listeners.append(self._record)
+
+    def close(self):
+        if self.roo is not None:
+            self.roo.changes.listeners.remove(self._record)
+            self.roo = None
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def _record(self, kind, order):
+        code = KIND_CODES.get(kind)
+        if code is None:
+            return
+        roo = self.roo
+        buffer = self.buffer
+        if order is None:
+            # A rescoring pass; replay runs it again at the same clock time
+            buffer += RECORD.pack(code, 0, 0.0, 0, 0, 0, 0.0, 0.0, math.nan, math.nan, False, 0.0,
+                                  _time(roo.scored_at))
+            self.records += 1
+            self.rescored += len(roo.orders)
+            if len(buffer) >= self.buffer_size:
+                self.flush()
+            return
+        dish_set = self.dish_sets.get(order.dish_mask)
+        if dish_set is None:
+            if order.dish_mask & ~self.dish_bits:
+                for dish in order.dishes:
+                    if dish.bit & ~self.dish_bits:
+                        self._declare(buffer, DISH, dish.bit.bit_length() - 1, dish.name.encode(), dish.complexity)
+                        self.dish_bits |= dish.bit
+            dish_set = self.dish_sets[order.dish_mask] = len(self.dish_sets)
+            self._declare(buffer, DISH_SET, dish_set, _mask_bytes(order.dish_mask))
+        source = self.sources.get(order.source)
+        if source is None:
+            source = self.sources[order.source] = len(self.sources)
+            self._declare(buffer, SOURCE, source, order.source.encode())
+        if order.order_id > self.last_order_id:
+            self.last_order_id = order.order_id
+        # Added and modified orders keep the priority they were just given
+        priority = roo.orders.priority(order.order_id) if kind in (ADDED, MODIFIED) and order.order_id in roo.orders else 0.0
+        buffer += RECORD.pack(code, order.order_id, order.order_time, dish_set, order.total_complexity, source,
+                              order.driver_wait_time, order.updating_order_driver_time, _time(order.start_time),
+                              _time(order.end_time), order.group_order_id, priority, _time(roo.scored_at))
+        self.records += 1
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+
+    @staticmethod
+    def _declare(buffer, kind, index, payload, complexity=0.0):
+        buffer += RECORD.pack(kind, index, complexity, len(payload), 0, 0, 0, 0, 0, 0, False, 0, 0)
+        buffer += payload
+
+    def flush(self):
+        if self.file is None or not self.buffer:
+            return
+        self.file.write(self.buffer)
+        self.buffer.clear()
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def maybe_snapshot(self):
+        # Call between operations; a snapshot in the middle of one would catch a half-moved group
+        if self.records >= self.snapshot_every or self.rescored >= self.rescore_every:
+            self.snapshot()
+
+    def snapshot(self):
+        """Write a new generation: a snapshot of the current state and an empty journal."""
+        roo = self.roo
+        self.flush()
+        generation = self.generation + 1
+
+        dishes = [[dish.name, dish.complexity] for dish in menu.by_bit]
+        queued = list(roo.orders)
+        current = roo.current_order or []
+        sources = {}
+        dish_sets = {}
+        records = []
+        with _paused_gc():
+            for priority, order, in_progress in itertools.chain(((priority, order, False) for priority, order in queued),
+                                                                ((0.0, order, True) for order in current)):
+                source = sources.get(order.source)
+                if source is None:
+                    source = sources[order.source] = len(sources)
+                dish_set = dish_sets.get(order.dish_mask)
+                if dish_set is None:
+                    dish_set = dish_sets[order.dish_mask] = len(dish_sets)
+                records.append((order.order_id, order.order_time, dish_set, order.total_complexity, source,
+                                order.driver_wait_time, order.updating_order_driver_time, _time(order.start_time),
+                                _time(order.end_time), order.group_order_id, priority, in_progress))
+            rows = np.array(records, dtype=SNAPSHOT_DTYPE)
+        del records
+        if len(rows):
+            self.last_order_id = max(self.last_order_id, int(rows['order_id'].max()))
+
+        # A kinetic queue reads its priorities at the time it was last advanced to
+        header = json.dumps({'generation': generation, 'orders': len(rows), 'last_order_id': self.last_order_id,
+                             'scored_at': roo.scored_at, 'kinetic_now': roo.orders.now if roo.kinetic else None,
+                             'dishes': dishes, 'dish_sets': [f'{mask:x}' for mask in dish_sets],
+                             'sources': list(sources)}).encode()
+        # Pad so the records start 8-byte aligned
+        padding = -(len(MAGIC) + 4 + len(header)) % 8
+        path = self._path('snapshot', generation)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(MAGIC + struct.pack('<I', len(header) + padding) + header + b' ' * padding)
+            f.write(rows.tobytes())
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+        if self.file is not None:
+            self.file.close()
+        self.file = open(self._path('journal', generation), 'ab')
+        self.generation = generation
+        self.records = 0
+        self.rescored = 0
+        self.dish_bits = (1 << len(dishes)) - 1
+        self.dish_sets = dish_sets
+        self.sources = sources
+        for old in self.generations()[:-self.keep]:
+            for kind in ('snapshot', 'journal'):
+                if os.path.exists(self._path(kind, old)):
+                    os.remove(self._path(kind, old))
+
+    def restore(self, roo):
+        """Load the latest snapshot into roo and replay the journal written after it.
+
+        Returns the number of orders queued or in progress afterwards.
+        """
+        generations = self.generations()
+        if not generations:
+            return 0
+        generation = generations[-1]
+        path = self._path('snapshot', generation)
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a ROO snapshot")
+            header_size, = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_size))
+        offset = len(MAGIC) + 4 + header_size
+        dishes = [Dish(name, complexity) for name, complexity in header['dishes']]
+        sources = header['sources']
+        decode = self._decoder(dishes)
+        dish_sets = [decode(int(mask, 16)) for mask in header['dish_sets']]
+
+        entries = []
+        current = []
+        self.last_order_id = max(self.last_order_id, header['last_order_id'])
+        kinetic_now = header['kinetic_now'] if roo.kinetic else None
+        if kinetic_now is not None:
+            # On a new ROO this only sets the time loaded keys are taken at, which is much cheaper
+            # than loading them at another time and advancing every one of them afterwards
+            _rescore_at(roo, kinetic_now)
+        with _paused_gc():
+            if header['orders']:
+                rows = np.memmap(path, dtype=SNAPSHOT_DTYPE, mode='r', offset=offset, shape=(header['orders'],))
+                in_progress = rows['in_progress']
+                queued = rows[~in_progress]
+                entries = list(zip(queued['priority'].tolist(), self._orders(queued, dish_sets, sources)))
+                if in_progress.any():
+                    current = self._orders(rows[in_progress], dish_sets, sources)
+                del rows, queued
+            roo.load(entries, current)
+            if kinetic_now is not None:
+                _rescore_at(roo, kinetic_now)
+            roo.scored_at = header['scored_at']
+        self._replay(roo, self._path('journal', generation), dishes, dish_sets, sources)
+        return len(roo.orders) + len(roo.current_order or [])
+
+    @staticmethod
+    def _orders(rows, dish_sets, sources):
+        # One Order per snapshot row, built like _build_order but without a call per row
+        new = Order.__new__
+        orders = []
+        append = orders.append
+        for (order_id, order_time, dish_set, total_complexity, source, driver_wait_time, updating_order_driver_time,
+             group) in zip(*(rows[name].tolist() for name in ('order_id', 'order_time', 'dish_set', 'total_complexity',
+                                                              'source', 'driver_wait_time',
+                                                              'updating_order_driver_time', 'group'))):
+            order = new(Order)
+            order.order_id = order_id
+            order.order_time = order_time
+            order._dishes, order.dish_mask, order.dish_complexity = dish_sets[dish_set]
+            order.total_complexity = total_complexity
+            order.group_order_id = group
+            order.source = sources[source]
+            order.driver_wait_time = driver_wait_time
+            order.updating_order_driver_time = updating_order_driver_time
+            order.start_time = None
+            order.end_time = None
+            append(order)
+        # Only started orders have times set
+        for name in ('start_time', 'end_time'):
+            column = rows[name]
+            for row in np.flatnonzero(~np.isnan(column)).tolist():
+                setattr(orders[row], name, float(column[row]))
+        return orders
+
+    @staticmethod
+    def _decoder(dishes):
+        # Stored masks use the bits of the process that wrote them; map each distinct mask once to
+        # (dishes, mask, complexity) in this process
+        cache = {}
+        def decode(mask):
+            found = cache.get(mask)
+            if found is None:
+                chosen = tuple(dish for bit, dish in enumerate(dishes) if mask >> bit & 1)
+                found = cache[mask] = (chosen, sum(dish.bit for dish in chosen), sum(dish.complexity for dish in chosen))
+            return found
+        return decode
+
+    def _replay(self, roo, path, dishes, dish_sets, sources):
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            data = f.read()
+        dish_list = list(dishes)
+        dish_sets = list(dish_sets)
+        sources = list(sources)
+        size = RECORD.size
+        position = 0
+        # A record cut short by a crash is ignored
+        while position + size <= len(data):
+            (code, order_id, order_time, dish_set, total_complexity, source, driver_wait_time,
+             updating_order_driver_time, start_time, end_time, group, priority,
+             scored_at) = RECORD.unpack_from(data, position)
+            position += size
+            if code in (DISH, SOURCE, DISH_SET):
+                # dish_set holds the length of the payload; order_id the index it declares
+                payload = data[position:position + dish_set]
+                position += dish_set
+                table = dish_list if code == DISH else sources if code == SOURCE else dish_sets
+                while len(table) <= order_id:
+                    table.append(None)
+                if code == DISH:
+                    table[order_id] = Dish(payload.decode(), int(order_time) if order_time.is_integer() else order_time)
+                elif code == SOURCE:
+                    table[order_id] = payload.decode()
+                else:
+                    table[order_id] = self._decoder(dish_list)(int.from_bytes(payload, 'little'))
+                continue
+            kind = KINDS[code]
+            if kind == RESCORED:
+                if not math.isnan(scored_at):
+                    _rescore_at(roo, scored_at)
+                continue
+            if order_id > self.last_order_id:
+                self.last_order_id = order_id
+            if kind == ADDED:
+                # Queued with the journaled priority and driver wait, as add_order left them
+                order = _build_order(order_id, order_time, dish_sets[dish_set], sources[source], driver_wait_time,
+                                     updating_order_driver_time, total_complexity, group)
+                roo.orders.push(priority, order)
+                roo.dish_index.add(priority, order)
+                if roo.columns is not None:
+                    roo.columns.add(order)
+                roo.scored_at = _optional(scored_at)
+            elif kind == MODIFIED:
+                order = roo.orders.get(order_id)
+                if order is not None:
+                    # What modify_order did, with the journaled priority instead of a new score
+                    order._dishes, order.dish_mask, order.dish_complexity = dish_sets[dish_set]
+                    order.total_complexity = total_complexity
+                    order.driver_wait_time = driver_wait_time
+                    order.updating_order_driver_time = updating_order_driver_time
+                    roo.orders.update(order_id, priority)
+                    roo.dish_index.remove(order_id)
+                    roo.dish_index.add(priority, order)
+                    if roo.columns is not None:
+                        roo.columns.refresh(order)
+                    roo.scored_at = _optional(scored_at)
+            elif kind == STARTED:
+                entry = roo.orders.remove(order_id)
+                if entry is not None:
+                    roo.dish_index.remove(order_id)
+                    if roo.columns is not None:
+                        roo.columns.remove(order_id)
+                    entry[1].start_time = _optional(start_time)
+                    roo.current_order = (roo.current_order or []) + [entry[1]]
+            elif kind == PROCESSED:
+                for order in roo.current_order or []:
+                    if order.order_id == order_id:
+                        order.total_complexity = total_complexity
+            elif kind == COMPLETED:
+                for order in roo.current_order or []:
+                    if order.order_id == order_id:
+                        order.end_time = _optional(end_time)
+                        roo.complete_order(order_id)
+                        break
+            elif kind == CANCELLED:
+                roo.cancel_order(order_id)
@@ -0,0 +1,66 @@
+import math
+import time
+
+# Hours of the day (local time) whose priorities get the rush-hour factor
+RUSH_HOURS = (12, 13, 14, 18, 19, 20)
+
+class PriorityModel:
+    """The ROO priority formula as a pure function of an order and the time.
+
+    ROO.calculate_order_priority counts the driver wait time of the order down on every call,
+    so its result depends on how often an order was scored. Here the driver is assumed to
+    arrive `driver_wait_time` minutes after the order was placed, and the priority is
+    lowered while there is more time left until then than the order needs to be prepared,
+    by that slack / 100 as in calculate_order_priority. Nothing on the order is changed.
+
+    Between a few breakpoints the key of an order is linear in time, which is what
+    KineticHeap relies on: key(t) = slope * t + intercept. The rush-hour factor multiplies
+    every key by the same amount, so it never changes the ordering and is applied separately.
+    """
+
+    def __init__(self, driver_weight, order_group_weight, order_priority_weight, seconds_per_minute = 60,
+                 group_factor = 1.1, rush_hour_factor = 1.1, rush_hours = RUSH_HOURS):
+        self.driver_weight = driver_weight
+        self.order_group_weight = order_group_weight
+        self.order_priority_weight = order_priority_weight
+        self.seconds_per_minute = seconds_per_minute
+        self.group_factor = group_factor
+        self.rush_hour_factor = rush_hour_factor
+        self.rush_hours = frozenset(rush_hours)
+
+    def rush_multiplier(self, now):
+        return self.rush_hour_factor if time.localtime(now).tm_hour in self.rush_hours else 1.0
+
+    def trajectory(self, order):
+        """Return (slope, intercept, breakpoint, slope_after, intercept_after) of the order's key.
+
+        The key is slope * t + intercept before `breakpoint` (math.inf when there is none)
+        and slope_after * t + intercept_after from then on.
+        """
+        if self.order_priority_weight:
+            divisor = math.log(order.total_complexity + 1)
+        else:
+            divisor = math.exp((1 / order.total_complexity) + 1)
+        factor = self.group_factor if order.group_order_id and self.order_group_weight else 1.0
+        scale = factor / divisor
+        slope = -scale
+        intercept = scale * order.order_time
+
+        # Minutes of slack the driver leaves when the order is placed
+        slack = order.driver_wait_time - order.total_complexity
+        if order.source != 'In Restaurant' and self.driver_weight and slack > 0:
+            # wait_time - slack(t) / 100, with the slack shrinking one minute per seconds_per_minute
+            catch_up = 1 + 1 / (100 * self.seconds_per_minute)
+            breakpoint = order.order_time + slack * self.seconds_per_minute
+            return -scale * catch_up, scale * (order.order_time * catch_up + slack / 100), breakpoint, slope, intercept
+        return slope, intercept, math.inf, slope, intercept
+
+    def key(self, order, now):
+        slope, intercept, breakpoint, slope_after, intercept_after = self.trajectory(order)
+        if now >= breakpoint:
+            return slope_after * now + intercept_after
+        return slope * now + intercept
+
+    def priority(self, order, now):
+        # Lower is more urgent, like calculate_order_priority
+        return self.rush_multiplier(now) * self.key(order, now)
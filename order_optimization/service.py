@@ -0,0 +1,298 @@
+"""Asyncio ingestion front-end for ROO.
+
+Orders from every channel (Bolt Foods, UberEats, Glovo, In Restaurant) go through one
+IngestionService: in process with submit()/offer(), or as JSON over a local HTTP endpoint.
+
+    python -m order_optimization.service --port 8080 --stations 2
+    curl -X POST localhost:8080/orders -d '{"dishes": ["Margherita", "Vegan"], "source": "Glovo", "driver_wait_time": 12}'
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+
+from .metrics import LATENCY_BUCKETS, Histogram
+from .order import Dish, Order, menu
+
+def _number(data, name, default):
+    value = data.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"{name} must be a number, got {value!r}")
+    return value
+
+
+def parse_order(data, order_id, now):
+    """Build an Order from its JSON form.
+
+    Dishes are menu names or [name, complexity] pairs of a dish on the menu; clients cannot
+    add dishes. The order always gets the service's order_id, as a client's own could collide
+    with it; order_time defaults to now. Raises ValueError when a field has the wrong type or
+    range or a dish is not on the menu.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("An order must be a JSON object")
+    dishes = data.get('dishes')
+    if not isinstance(dishes, list) or not dishes:
+        raise ValueError("An order needs a list of at least one dish")
+    found = []
+    for dish in dishes:
+        if isinstance(dish, str):
+            known = menu.named(dish)
+        elif isinstance(dish, list) and len(dish) == 2 and isinstance(dish[0], str):
+            known = menu.dishes.get((dish[0], dish[1]))
+        else:
+            raise ValueError(f"A dish is a menu name or a [name, complexity] pair, got {dish!r}")
+        if known is None:
+            raise ValueError(f"Unknown dish {dish!r}")
+        found.append(known)
+    source = data.get('source', 'In Restaurant')
+    if not isinstance(source, str):
+        raise ValueError(f"source must be a string, got {source!r}")
+    driver_wait_time = _number(data, 'driver_wait_time', 0)
+    if driver_wait_time < 0:
+        raise ValueError("driver_wait_time cannot be negative")
+    return Order(order_id, _number(data, 'order_time', now), found, source, driver_wait_time)
+
+
+class IngestionService:
+    """Feeds orders into a ROO queue in micro-batches from a single asyncio task.
+
+    Producers never touch ROO: submit() waits while `max_pending` orders are already
+    buffered and offer() returns False instead, which the HTTP endpoint reports as 429.
+    The ingest task takes up to `batch_size` buffered orders at a time, adds them, rescores
+    the queue once per batch (when `optimize` is set) and wakes the kitchen. Once ROO holds
+    `max_queued` orders, ingestion pauses until the kitchen catches up, so the buffer fills
+    and the backpressure reaches the producers.
+
+    With a KitchenExecutor, scheduling runs on its own task through KitchenExecutor.run.
+    With an OrderJournal attached to roo, the journal is flushed after every batch.
+    """
+
+    def __init__(self, roo, kitchen=None, batch_size=256, max_pending=10_000, max_queued=None, optimize=True,
+                 poll_interval=0.005, journal=None):
+        self.roo = roo
+        self.kitchen = kitchen
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.max_queued = max_queued
+        self.optimize = optimize
+        self.poll_interval = poll_interval
+        self.journal = journal
+        self.pending = None
+        self.server = None
+        self.tasks = []
+        self.next_id = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.failed = 0  # accepted orders ROO could not add
+        self.batches = 0
+        self.largest_batch = 0
+        # Seconds from submit() or offer() until the order is in the ROO queue
+        self.latency = Histogram(LATENCY_BUCKETS)
+
+    async def start(self):
+        self.pending = asyncio.Queue(self.max_pending)
+        self.tasks = [asyncio.create_task(self._ingest())]
+        if self.kitchen is not None:
+            self.tasks.append(asyncio.create_task(self.kitchen.run()))
+
+    async def stop(self, drain=True):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        if drain:
+            await self.pending.join()
+        if self.kitchen is not None:
+            self.kitchen.stop()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.journal is not None:
+            self.journal.close()
+
+    def _assign_id(self):
+        self.next_id += 1
+        return self.next_id
+
+    async def submit(self, order):
+        # Wait for room in the buffer
+        await self.pending.put((order, time.perf_counter()))
+        self.accepted += 1
+
+    def offer(self, order):
+        # Buffer the order unless the service is saturated; returns whether it was accepted
+        try:
+            self.pending.put_nowait((order, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    async def _ingest(self):
+        pending = self.pending
+        roo = self.roo
+        while True:
+            batch = [await pending.get()]
+            while len(batch) < self.batch_size and not pending.empty():
+                batch.append(pending.get_nowait())
+            while self.max_queued is not None and len(roo.orders) >= self.max_queued:
+                # The kitchen is behind; hold the batch and let the buffer push back on producers
+                await asyncio.sleep(self.poll_interval)
+            try:
+                for order, _ in batch:
+                    if order.order_id in roo.orders:
+                        # ROO would only print and drop it, and the producer was told it was accepted
+                        self.failed += 1
+                        print(f"Order {order.order_id} is already queued, skipping...")
+                        continue
+                    # One bad order must not take the ingest task down with it
+                    try:
+                        roo.add_order(order)
+                    except Exception as e:
+                        self.failed += 1
+                        print(f"Order {order.order_id} could not be added ({e!r}), skipping...")
+                if self.optimize:
+                    roo.optimize_orders()
+                if self.kitchen is not None:
+                    self.kitchen.notify()
+                if self.journal is not None:
+                    self.journal.flush()
+                    self.journal.maybe_snapshot()
+            finally:
+                # Always account for the batch, so stop(drain=True) never waits on it forever
+                added = time.perf_counter()
+                for _, received in batch:
+                    self.latency.observe(added - received)
+                    pending.task_done()
+            self.batches += 1
+            self.largest_batch = max(self.largest_batch, len(batch))
+            # Let producers and the kitchen run between batches
+            await asyncio.sleep(0)
+
+    def stats(self):
+        return {
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'failed': self.failed,
+            'pending': self.pending.qsize() if self.pending is not None else 0,
+            'queued': len(self.roo.orders),
+            'in_progress': len(self.roo.current_order) if self.roo.current_order else 0,
+            'batches': self.batches,
+            'largest_batch': self.largest_batch,
+            'ingest_p50_s': self.latency.quantile(0.5),
+            'ingest_p99_s': self.latency.quantile(0.99),
+        }
+
+    async def serve_http(self, host='127.0.0.1', port=8080):
+        """Serve POST /orders (one JSON order or a list of them) and GET /stats."""
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server
+
+    def _route(self, method, path, body):
+        if method == 'GET' and path == '/stats':
+            return '200 OK', self.stats()
+        if method != 'POST' or path != '/orders':
+            return '404 Not Found', {'error': 'not found'}
+        try:
+            data = json.loads(body)
+            now = self.roo.clock()
+            orders = [parse_order(item, self._assign_id(), now) for item in (data if isinstance(data, list) else [data])]
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            return '400 Bad Request', {'error': str(e)}
+        accepted = 0
+        for order in orders:
+            if not self.offer(order):
+                return '429 Too Many Requests', {'accepted': accepted, 'error': 'queue saturated'}
+            accepted += 1
+        return '202 Accepted', {'accepted': accepted}
+
+    async def _handle(self, reader, writer):
+        # Minimal HTTP/1.1 with keep-alive, enough for local producers and the load generator
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                status, payload = self._route(method, path, body)
+                data = json.dumps(payload).encode()
+                writer.write(f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\n'
+                             f'Content-Length: {len(data)}\r\n\r\n'.encode() + data)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(args):
+    from order_simulation.simulation import MENU
+    from .order_optimization import ROO
+    from .persistence import OrderJournal
+    from .stations import KitchenExecutor, Station
+
+    # Put the dashboard's dishes on the menu so orders can name them
+    for name, complexity in MENU:
+        Dish(name, complexity)
+    roo = ROO(driver_weight=True, order_group_weight=True, order_priority_weight=True, kinetic=args.kinetic,
+              seconds_per_minute=args.seconds_per_complexity)
+    kitchen = KitchenExecutor(roo, [Station(f'Station {i + 1}') for i in range(args.stations)],
+                              seconds_per_complexity=args.seconds_per_complexity)
+    journal = None
+    if args.state:
+        journal = OrderJournal(args.state)
+        restored = journal.restore(roo)
+        # No station holds the groups that were cooking, so they go back to the queue and start over
+        in_progress, roo.current_order = roo.current_order or [], None
+        for order in in_progress:
+            roo.add_order(order)
+        journal.attach(roo)
+        print(f"Restored {restored} orders from {args.state}")
+    service = IngestionService(roo, kitchen, batch_size=args.batch_size, max_pending=args.max_pending,
+                               max_queued=args.max_queued, journal=journal)
+    if journal is not None:
+        # Carry on after the highest id the journal has seen, or new orders would be skipped as duplicates
+        service.next_id = max(service.next_id, journal.last_order_id)
+    await service.start()
+    await service.serve_http(args.host, args.port)
+    print(f"Accepting orders on http://{args.host}:{args.port}/orders")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.stop(drain=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the order ingestion service.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--stations', type=int, default=1)
+    parser.add_argument('--seconds-per-complexity', type=float, default=0.6)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--max-pending', type=int, default=10_000)
+    parser.add_argument('--max-queued', type=int, default=None)
+    parser.add_argument('--kinetic', action='store_true')
+    parser.add_argument('--state', help="directory to keep the queue in across restarts")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import asyncio
+
+class Station:
+    """A kitchen station (oven, prep line...) that cooks one group of orders at a time.
+
+    capacity is the largest group it takes, speed scales its cooking time and dishes limits
+    it to the dishes it has affinity for (None means the whole menu).
+    """
+
+    def __init__(self, name, capacity=2, speed=1.0, dishes=None):
+        self.name = name
+        self.capacity = capacity
+        self.speed = speed
+        self.dish_mask = None
+        if dishes is not None:
+            self.dish_mask = 0
+            for dish in dishes:
+                self.dish_mask |= dish.bit
+        self.current_order = []
+        self.busy_until = None
+        self.groups = 0
+        self.busy_time = 0
+
+    @property
+    def free(self):
+        return not self.current_order
+
+
+class KitchenExecutor:
+    """Runs several order groups at once, one per Station, on top of a ROO queue.
+
+    dispatch() hands the best group each free station can cook to it and returns when every
+    started group will be done; complete() is called once that time is reached. Nothing is
+    polled: a simulation schedules complete() as an event on its virtual clock and run()
+    does the same with asyncio timers on the ROO clock.
+
+    roo.current_order holds the orders of every station, so the dashboard shows them all.
+    """
+
+    def __init__(self, roo, stations, threshold=2, seconds_per_complexity=0.6):
+        self.roo = roo
+        self.stations = list(stations)
+        self.threshold = threshold
+        self.seconds_per_complexity = seconds_per_complexity
+        self._wakeup = None
+        self._running = False
+
+    def dispatch(self):
+        """Start a group on every free station that has work and return [(station, finish_time)]."""
+        roo = self.roo
+        started = []
+        for station in self.stations:
+            if not roo.orders:
+                break
+            if not station.free:
+                continue
+            group = roo.take_group(self.threshold, station.capacity, station.dish_mask)
+            if not group:
+                continue
+            now = roo.clock()
+            for order in group:
+                order.start_time = now
+                order.end_time = now + order.total_complexity * self.seconds_per_complexity / station.speed
+            station.current_order = group
+            station.busy_until = max(order.end_time for order in group)
+            station.groups += 1
+            station.busy_time += station.busy_until - now
+            roo.current_order = (roo.current_order or []) + group
+            started.append((station, station.busy_until))
+        return started
+
+    def complete(self, station):
+        """Finish the group cooking on station and return its orders."""
+        group = station.current_order
+        for order in group:
+            self.roo.complete_order(order.order_id)
+        station.current_order = []
+        station.busy_until = None
+        return group
+
+    def notify(self):
+        # Wake run() up after orders were added to the queue
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def stop(self):
+        self._running = False
+        self.notify()
+
+    def _finish(self, station):
+        self.complete(station)
+        self.notify()
+
+    async def run(self):
+        """Dispatch in real time until stop() is called, using asyncio timers for completions."""
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._running = True
+        try:
+            while self._running:
+                for station, finish_time in self.dispatch():
+                    loop.call_later(max(0, finish_time - self.roo.clock()), self._finish, station)
+                await self._wakeup.wait()
+                self._wakeup.clear()
+        finally:
+            self._wakeup = None
@@ -1,94 +1,125 @@
 import streamlit as st
-import copy
+import itertools
+import weakref
 
 from datetime import datetime
 
-class Dish:
-    def __init__(self, name, complexity):
-        self.name = name
-        self.complexity = complexity
-
-class Order:
-    def __init__(self, order_id, order_time, dishes, source, driver_wait_time):
-        self.order_id = order_id
-        self.order_time = order_time
-        self.dishes = dishes
-        self.total_complexity = sum(dish.complexity for dish in dishes)
-        self.group_order_id = True if len(dishes) > 3 else False
-        self.source = source
-        
-        if self.source == 'In Restaurant':
-            self.driver_wait_time = 0
-        else:
-            self.driver_wait_time = driver_wait_time
-        
-        self.updating_order_driver_time = 0
-        self.start_time = None
-        self.end_time = None
-    
-    def get_feature_vector(self):
-        # For simplicity, let's encode order source as an integer
-        source_encoding = 0
-        if self.source == 'Bolt Foods':
-            source_encoding = 1
-        elif self.source == 'UberEats':
-            source_encoding = 2
-        elif self.source == 'Glovo':
-            source_encoding = 3
-
-        # Total complexity of dishes
-        total_complexity = sum(dish.complexity for dish in self.dishes)
-
-        # Driver wait time
-        wait_time = self.driver_wait_time
-
-        # Return feature vector as a list
-        return [source_encoding, total_complexity, wait_time]
+from .changes import CANCELLED, COMPLETED, MODIFIED
 
 def chunks(lst, n):
     """Yield successive n-sized chunks from lst."""
     for i in range(0, len(lst), n):
         yield lst[i:i + n]
         
-def show_orders(roo, containers, limit=None, num_columns=3):
-    orders = roo.orders
-    displayed_order_ids = []  # list to keep track of displayed order IDs
+class OrderCardCache:
+    """HTML of the order cards shown by show_orders, kept between calls.
+
+    The static part of a card (dishes, order time, source) is formatted once per order and
+    a card is only rebuilt when one of its live fields (priority, remaining complexity,
+    driver wait, colour) changes. Entries are dropped through the ROO change journal when
+    an order is modified, completed or cancelled.
+    """
+
+    def __init__(self):
+        self.static = {}  # order_id -> (dishes, order time, source)
+        self.cards = {}  # order_id -> (live fields, card html)
+        self.version = 0
+
+    def sync(self, roo):
+        changes = roo.changes_since(self.version)
+        if changes is None:
+            self.static.clear()
+            self.cards.clear()
+        else:
+            for _, kind, order_id in changes:
+                if kind in (MODIFIED, COMPLETED, CANCELLED):
+                    self.static.pop(order_id, None)
+                    self.cards.pop(order_id, None)
+        self.version = roo.version
+
+    def card(self, order, priority, card_color):
+        fields = (
+            -round(priority, 3) if isinstance(priority, float) else priority,
+            order.total_complexity,
+            round(order.driver_wait_time, 1) if order.source != "In Restaurant" else "N/A",
+            card_color,
+        )
+        cached = self.cards.get(order.order_id)
+        if cached is not None and cached[0] == fields:
+            return cached[1]
+
+        static = self.static.get(order.order_id)
+        if static is None:
+            static = self.static[order.order_id] = (
+                ", ".join([dish.name for dish in order.dishes]),
+                datetime.fromtimestamp(order.order_time).strftime('%Y-%m-%d %H:%M:%S'),
+                order.source,
+            )
+        priority_score, total_complexity, driver_wait_time, card_color = fields
+        dishes, order_time, source = static
+        orders_html = f"""
+                        <div class="ui card">   
+                            <div class="content {card_color}">
+                                <div class="header smallheader"># Order {order.order_id}</div>
+                            </div>
+                                <div class="extra content">
+                                    <div class="meta" style="text-align: left;"><i class="sort numeric up icon"></i> <strong>Priority Score:</strong> {priority_score}</div>
+                                    <div class="meta" style="text-align: left;"><i class="utensils icon"></i> <strong>Dishes:</strong> {dishes}</div>
+                                    <div class="meta" style="text-align: left;"><i class="clock icon"></i> <strong>Total Time to Complete:</strong> {total_complexity} min</div>
+                                    <div class="meta" style="text-align: left;"><i class="calendar alternate outline icon"></i> <strong>Order time:</strong> {order_time}</div>
+                                    <div class="meta" style="text-align: left;"><i class="shopping cart icon"></i> <strong>Order Type:</strong> {source}</div>
+                                    <div class="meta" style="text-align: left;"><i class="user clock icon"></i> <strong>Driver wait time:</strong> {driver_wait_time}</div>
+                                </div>
+                        </div>"""
+        orders_html += "</div>"
+        self.cards[order.order_id] = (fields, orders_html)
+        return orders_html
 
+# One card cache per ROO instance, released together with it
+_card_caches = weakref.WeakKeyDictionary()
+
+def visible_orders(roo, limit=None, page=0):
+    """Return the (priority, order) pairs on the given page: the current group first, then the queue by priority."""
+    orders = []
     if roo.current_order:
-        current_orders_id = [order.order_id for order in roo.current_order]
-        orders = [('Doing Order', order) for order in roo.current_order] + orders
+        orders = [('Doing Order', order) for order in roo.current_order]
+    # Walk the queue in priority order only as far as the page reaches
+    orders = itertools.chain(orders, roo.orders.iter_sorted())
     if limit is not None:
-        orders = orders[:limit]
+        orders = itertools.islice(orders, page * limit, (page + 1) * limit)
+    return list(orders)
+
+def show_orders(roo, containers, limit=None, num_columns=3, page=0):
+    cache = _card_caches.get(roo)
+    if cache is None:
+        cache = _card_caches[roo] = OrderCardCache()
+    cache.sync(roo)
+
+    orders = visible_orders(roo, limit, page)
+    current_orders_id = {order.order_id for order in roo.current_order} if roo.current_order else set()
+    show_cards(orders, current_orders_id, cache, containers, num_columns)
+
+def show_snapshot(snapshot, containers, cache, num_columns=3):
+    """Render a LiveSimulation snapshot; cache is the OrderCardCache passed to its snapshot()."""
+    show_cards(snapshot.orders, snapshot.current_order_ids, cache, containers, num_columns)
+
+def show_cards(orders, current_orders_id, cache, containers, num_columns=3):
+    displayed_order_ids = set()  # set to keep track of displayed order IDs
+
     containers = containers.empty()
     with containers.container():
         for i, order_chunk in enumerate(chunks(orders, num_columns)):
             cols = st.columns(num_columns, gap="medium")
-            orders_html = "<div class=\"ui centered cards\">"
             for (priority, order), col in zip(order_chunk, cols):
                 if order.order_id in displayed_order_ids:  # if order ID has already been displayed, skip this order
                     continue
-                displayed_order_ids.append(order.order_id)
+                displayed_order_ids.add(order.order_id)
                 with col:
-                    if roo.current_order and order.order_id in current_orders_id:
+                    if order.order_id in current_orders_id:
                         card_color = "mvbackground"
                     else:
                         card_color = "viewbackground"
-                    orders_html = f"""
-                                    <div class="ui card">   
-                                        <div class="content {card_color}">
-                                            <div class="header smallheader"># Order {order.order_id}</div>
-                                        </div>
-                                            <div class="extra content">
-                                                <div class="meta" style="text-align: left;"><i class="sort numeric up icon"></i> <strong>Priority Score:</strong> {-round(priority,3) if isinstance(priority, float) else priority}</div>
-                                                <div class="meta" style="text-align: left;"><i class="utensils icon"></i> <strong>Dishes:</strong> {", ".join([dish.name for dish in order.dishes])}</div>
-                                                <div class="meta" style="text-align: left;"><i class="clock icon"></i> <strong>Total Time to Complete:</strong> {order.total_complexity} min</div>
-                                                <div class="meta" style="text-align: left;"><i class="calendar alternate outline icon"></i> <strong>Order time:</strong> {datetime.fromtimestamp(order.order_time).strftime('%Y-%m-%d %H:%M:%S')}</div>
-                                                <div class="meta" style="text-align: left;"><i class="shopping cart icon"></i> <strong>Order Type:</strong> {order.source}</div>
-                                                <div class="meta" style="text-align: left;"><i class="user clock icon"></i> <strong>Driver wait time:</strong> {round(order.driver_wait_time, 1) if order.source != "In Restaurant" else "N/A"}</div>
-                                            </div>
-                                    </div>"""
-                    orders_html += "</div>"
-                    st.markdown(orders_html, unsafe_allow_html=True)
+                    st.markdown(cache.card(order, priority, card_color), unsafe_allow_html=True)
             st.markdown(f"""<br><br>""", unsafe_allow_html=True)
                     
 def apply_styles():
@@ -96,15 +127,38 @@ def apply_styles():
     with open("styles/style.css") as f:
         st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
 
-def update_if_changed(roo, orders_container, previous_orders, previous_current_order):
-    """Update orders_container if roo.orders or roo.current_order have changed."""
+def update_if_changed(roo, orders_container, previous_version):
+    """Update orders_container if roo has changed since previous_version and return the version shown."""
 
-    if roo.orders != previous_orders or roo.current_order != previous_current_order:
+    if roo.version != previous_version:
         orders_container.empty()
         show_orders(roo, orders_container)
 
-    # update previous_orders and previous_current_order for the next iteration
-    previous_orders = copy.deepcopy(roo.orders)
-    previous_current_order = copy.deepcopy(roo.current_order)
-    
-    return previous_orders, previous_current_order
\ No newline at end of file
+    # pass the returned version back in on the next iteration
+    return roo.version
+
+def show_metrics(metrics, container, kpis=None):
+    """Render engine metrics (see RooMetrics.summary) into a sidebar container; nothing when metrics is None.
+
+    kpis are the rolling service KPIs of an EventLog, shown below when given.
+    """
+    if metrics is None:
+        return
+    with container.container():
+        st.markdown("<h5><strong>Engine Metrics:</strong></h5>", unsafe_allow_html=True)
+        col1, col2 = st.columns(2)
+        col1.metric("Queue length", metrics['queue_length'])
+        col2.metric("Batch-hit rate", f"{metrics['batch_hit_rate']:.0%}")
+        col1.metric("Time to start", f"{metrics['time_to_start']:.1f}s")
+        col2.metric("Driver idle", f"{metrics['driver_idle']:.1f}s")
+        col1.metric("Duplicates", metrics['duplicate_orders'])
+        col2.metric("Groups", metrics['groups_started'])
+        st.caption(f"optimize_orders p50 {metrics['optimize_p50'] * 1e6:,.0f}us, p95 {metrics['optimize_p95'] * 1e6:,.0f}us")
+        if kpis is not None:
+            st.markdown("<h5><strong>Service, last hour:</strong></h5>", unsafe_allow_html=True)
+            col1, col2 = st.columns(2)
+            col1.metric("Prep time p50", f"{kpis['prep_p50']:.1f}s")
+            col2.metric("Prep time p95", f"{kpis['prep_p95']:.1f}s")
+            col1.metric("Orders per hour", f"{kpis['completed_per_hour']:.0f}")
+            for source, wait in kpis['driver_wait_by_source'].items():
+                st.caption(f"Driver wait, {source}: {wait:.1f}s")
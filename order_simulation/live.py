@@ -0,0 +1,178 @@
+"""The dashboard's restaurant simulation, running in real time in a background thread.
+
+LiveSimulation owns the ROO and plays orders into it like app.py always has: a new order
+every 0.2 to 3.5 seconds and `seconds_per_complexity` per unit of complexity in the
+kitchen. The Streamlit script only takes snapshots of it, so a widget change no longer
+restarts the simulation and slow rendering no longer slows the kitchen down. Settings
+changed through configure() take effect on the running queue straight away.
+"""
+import copy
+import random
+import threading
+
+from order_optimization.events import EventLog
+from order_optimization.order_optimization import ROO
+from .simulation import OrderGenerator
+
+# Settings configure() accepts, besides seconds_per_complexity and metrics
+WEIGHTS = ('driver_weight', 'order_group_weight', 'order_priority_weight')
+
+class Snapshot:
+    """Copy of what the dashboard shows, taken under the simulation lock."""
+
+    def __init__(self, version, orders, current_order_ids, processing, queued, completed, finished, kpis, metrics=None,
+                 prometheus=None):
+        self.version = version
+        self.orders = orders  # (priority, order copy), the cooking group first
+        self.current_order_ids = current_order_ids
+        self.processing = processing  # (order ids, remaining complexity) of the group being cooked, or None
+        self.queued = queued
+        self.completed = completed
+        self.finished = finished
+        self.kpis = kpis  # rolling service KPIs, see EventLog.kpis
+        self.metrics = metrics  # RooMetrics.summary(), or None while metrics are off
+        self.prometheus = prometheus  # metrics and KPIs in the Prometheus text format, when asked for
+
+
+class LiveSimulation:
+    """Background worker running the dashboard simulation on the wall clock.
+
+    Every mutation of the ROO happens under `lock`, which is never held while sleeping, so
+    snapshot() and configure() from the UI thread only wait for one short step.
+    """
+
+    def __init__(self, n_orders, driver_weight=True, order_group_weight=True, order_priority_weight=True,
+                 seconds_per_complexity=0.6, seed=None, metrics=False):
+        self.roo = ROO(driver_weight=driver_weight, order_group_weight=order_group_weight,
+                       order_priority_weight=order_priority_weight)
+        self.n_orders = n_orders
+        self.seconds_per_complexity = seconds_per_complexity
+        self.generator = OrderGenerator(seed)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        # Lifecycle events of every order, with the rolling KPIs the dashboard shows
+        self.events = EventLog(self.roo, seconds_per_minute=seconds_per_complexity)
+        self.processing = None
+        self.completed = 0
+        self.finished = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, name='live-simulation', daemon=True)
+        if metrics:
+            self.roo.enable_metrics(seconds_per_minute=seconds_per_complexity)
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def configure(self, **settings):
+        """Change the ROO weights, seconds_per_complexity or metrics while the simulation runs."""
+        with self.lock:
+            roo = self.roo
+            rescore = False
+            for name, value in settings.items():
+                if name in WEIGHTS:
+                    if getattr(roo, name) != value:
+                        setattr(roo, name, value)
+                        setattr(roo.model, name, value)
+                        rescore = True
+                elif name == 'seconds_per_complexity':
+                    self.seconds_per_complexity = value
+                    self.events.seconds_per_minute = value
+                elif name == 'metrics':
+                    if value and roo.metrics is None:
+                        roo.enable_metrics(seconds_per_minute=self.seconds_per_complexity)
+                    elif not value and roo.metrics is not None:
+                        roo.disable_metrics()
+                else:
+                    raise TypeError(f"Unknown setting {name!r}")
+            if rescore:
+                # Reorder the queue under the new weights now rather than on the next tick
+                roo.optimize_orders()
+
+    def snapshot(self, limit=None, cache=None, prometheus=False):
+        """Copy the first `limit` orders (all by default) for rendering.
+
+        A card cache (see utils.OrderCardCache) passed in is synced with the ROO change journal
+        under the lock as well, and so are the engine metrics read, rendered in the Prometheus
+        text format too when `prometheus` is set.
+        """
+        with self.lock:
+            roo = self.roo
+            if cache is not None:
+                cache.sync(roo)
+            orders = [(priority, copy.copy(order)) for priority, order in self._visible(limit)]
+            current_order_ids = {order.order_id for order in roo.current_order} if roo.current_order else set()
+            kpis = self.events.kpis()
+            metrics = text = None
+            if roo.metrics is not None:
+                metrics = roo.metrics.summary()
+                if prometheus:
+                    text = roo.metrics.to_prometheus(self.events.prometheus_lines(kpis))
+            return Snapshot(roo.version, orders, current_order_ids, self.processing, len(roo.orders), self.completed,
+                            self.finished, kpis, metrics, text)
+
+    def _visible(self, limit):
+        roo = self.roo
+        current = [('Doing Order', order) for order in roo.current_order] if roo.current_order else []
+        for entry in current:
+            yield entry
+        shown = len(current)
+        for entry in roo.orders.iter_sorted():
+            if limit is not None and shown >= limit:
+                return
+            yield entry
+            shown += 1
+
+    def _sleep(self, seconds):
+        # Returns True when stop() was called meanwhile
+        return self._stop.wait(seconds)
+
+    def run(self):
+        order_id = 0
+        roo = self.roo
+        while not self._stop.is_set():
+            with self.lock:
+                if order_id < self.n_orders:
+                    roo.add_order(self.generator.make_order(order_id, roo.clock()))
+                    order_id += 1
+                roo.optimize_orders()
+                # The kitchen picks up work on about half of the ticks, as the dashboard always did
+                if self.rng.random() < 0.5 and order_id > 1:
+                    roo.start_order()
+                    roo.optimize_orders()
+                group = list(roo.current_order) if roo.current_order else []
+
+            if group:
+                # The whole group cooks at once, one unit of complexity per tick down to 0
+                remaining = None
+                while remaining != 0:
+                    with self.lock:
+                        remaining = max(order.total_complexity for order in group)
+                        self.processing = ([order.order_id for order in group], remaining)
+                        roo.process_group()
+                        roo.optimize_orders()
+                    if self._sleep(self.seconds_per_complexity):
+                        return
+                with self.lock:
+                    for order in group:
+                        roo.complete_order(order.order_id)
+                    self.processing = None
+                    self.completed += len(group)
+                    roo.optimize_orders()
+
+            with self.lock:
+                if order_id >= self.n_orders and not roo.orders and not roo.current_order:
+                    self.finished = True
+                    return
+            # Wait for the next order to come in
+            if self._sleep(self.generator.next_gap()):
+                return
@@ -1,42 +1,49 @@
 import gym
 import numpy as np
-import time
+
+from .vector_env import FEATURES, BatchedOrderEnv
 
 class OrderEnv(gym.Env):
-    def __init__(self, roo):
+    """Single restaurant environment: a BatchedOrderEnv with one kitchen.
+
+    The observation is the padded queue (one row of FEATURES per slot) and the action is the
+    slot of the order to start next. Use BatchedOrderEnv directly to train on many kitchens.
+    """
+
+    def __init__(self, roo=None, max_queue=64, **kwargs):
         super(OrderEnv, self).__init__()
+        # ROO settings drive the baseline policy returned by roo_action
         self.roo = roo
-        self.state = self.get_initial_state()
-
-        n_features = 5  # Adjust this as per your requirements
+        self.env = BatchedOrderEnv(num_envs=1, max_queue=max_queue, **kwargs)
+        self.action_mask = None
+        self.state = None
 
-        self.action_space = gym.spaces.Discrete(len(self.roo.orders))
-        self.observation_space = gym.spaces.Box(low=0, high=np.inf, shape=(len(self.roo.orders), n_features))
+        self.action_space = gym.spaces.Discrete(max_queue)
+        self.observation_space = gym.spaces.Box(low=-np.inf, high=np.inf, shape=(max_queue, len(FEATURES)), dtype=np.float32)
 
     def step(self, action):
-        reward = self.roo.process_order(action)
-        self.state = self.get_state()
-        done = self.check_if_done()
-        return self.state, reward, done, {}
-
-    def reset(self):
-        self.roo.reset()
-        self.state = self.get_initial_state()
+        (observation, action_mask), rewards, terminated, _, info = self.env.step(np.array([action]))
+        if terminated[0]:
+            # Report the finished queue; the batched env has already started the next episode
+            observation = info['final_observation']
+        self.state = observation[0].copy()
+        self.action_mask = action_mask[0]
+        return self.state, float(rewards[0]), bool(terminated[0]), {'action_mask': self.action_mask}
+
+    def reset(self, seed=None):
+        (observation, action_mask), _ = self.env.reset(seed)
+        self.state = observation[0].copy()
+        self.action_mask = action_mask[0]
         return self.state
 
     def render(self, mode='human'):
-        print(self.state)
+        print(self.state[self.action_mask])
 
-    def get_initial_state(self):
-        return np.array([self.get_order_features(order) for order in self.roo.orders])
-
-    def get_order_features(self, order):
-        features = []
-        features.append(order.total_complexity)
-        features.append(order.wait_time)
-        features.append(self.encode_source(order.source))
-        features.append(len(order.dishes))
-        return features
+    def roo_action(self):
+        # The order ROO's priority formula would start next
+        if self.roo is None:
+            return int(self.env.roo_actions()[0])
+        return int(self.env.roo_actions(self.roo.order_group_weight, self.roo.order_priority_weight, self.roo.group_factor)[0])
 
     def encode_source(self, source):
         if source == 'Bolt Foods':
@@ -47,9 +54,3 @@ class OrderEnv(gym.Env):
             return 3
         else:  # Assuming the only remaining source is 'In Restaurant'
             return 4
-
-    def get_state(self):
-        return np.array([self.get_order_features(order) for order in self.roo.orders if not order.processed])
-
-    def check_if_done(self):
-        return all(order.processed for order in self.roo.orders)
\ No newline at end of file
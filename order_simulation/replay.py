@@ -0,0 +1,284 @@
+"""Replay historical orders from a CSV or Parquet trace through ROO.
+
+The trace is read in record batches with pyarrow and completed orders are written out in
+chunks, so memory follows the orders in the kitchen, not the length of the trace. Rows need
+order_id, order_time (epoch seconds or a timestamp), dishes (menu names joined by ';'),
+source and driver_wait_time (minutes), sorted by order_time. Rows that cannot be replayed,
+e.g. a delivery without a driver wait time, are skipped and counted.
+
+    python -m order_simulation.replay --make-trace trace.parquet --orders 2000000
+    python -m order_simulation.replay trace.parquet --output outcomes.parquet --stations 2
+
+Times run on the simulation's virtual clock. With --speedup the replay is paced against the
+wall clock instead, that many times faster than recorded, e.g. to feed a live dashboard.
+"""
+import argparse
+import heapq
+import math
+import time
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from order_optimization.metrics import WAIT_BUCKETS, Histogram
+from order_optimization.order import Dish, Order, menu
+from order_optimization.stations import Station
+from .simulation import ARRIVAL, MENU, OrderGenerator, RestaurantSimulation
+
+TRACE_COLUMNS = ('order_id', 'order_time', 'dishes', 'source', 'driver_wait_time')
+OUTCOME_SCHEMA = pa.schema([
+    ('order_id', pa.int64()), ('source', pa.string()), ('order_time', pa.float64()), ('start_time', pa.float64()),
+    ('end_time', pa.float64()), ('wait', pa.float64()), ('lead_time', pa.float64()), ('driver_wait', pa.float64()),
+    ('group', pa.int64()), ('group_size', pa.int64()),
+])
+
+def read_batches(path, batch_rows=65_536):
+    """Yield pyarrow record batches of the trace without loading all of it."""
+    if path.endswith(('.parquet', '.pq')):
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_rows, columns=list(TRACE_COLUMNS))
+    else:
+        # About 64 bytes per row, so blocks hold roughly batch_rows rows
+        reader = pa_csv.open_csv(path, read_options=pa_csv.ReadOptions(block_size=max(1 << 20, batch_rows * 64)))
+        yield from reader
+
+def _number(value):
+    return not isinstance(value, bool) and isinstance(value, (int, float)) and math.isfinite(value)
+
+
+class TraceOrders:
+    """Iterates over a trace as Orders, with dishes looked up on the menu by name.
+
+    A row that cannot be replayed is reported and skipped, and `skipped` counts them. In
+    Restaurant orders have no driver, so a missing driver_wait_time is only an error on
+    delivery rows.
+    """
+
+    def __init__(self, path, batch_rows=65_536, separator=';'):
+        self.path = path
+        self.batch_rows = batch_rows
+        self.separator = separator
+        self.skipped = 0
+
+    def __iter__(self):
+        for batch in read_batches(self.path, self.batch_rows):
+            columns = batch.to_pydict()
+            for row in zip(*(columns[name] for name in TRACE_COLUMNS)):
+                try:
+                    order = self._order(*row)
+                except ValueError as e:
+                    self.skipped += 1
+                    print(f"Order {row[0]} cannot be replayed ({e}), skipping...")
+                    continue
+                yield order
+
+    def _order(self, order_id, order_time, dishes, source, driver_wait_time):
+        if isinstance(order_id, bool) or not isinstance(order_id, int):
+            raise ValueError(f"order_id {order_id!r} is not an integer")
+        if isinstance(order_time, datetime):
+            order_time = order_time.timestamp()
+        if not _number(order_time):
+            raise ValueError(f"order_time {order_time!r} is not a time")
+        if not isinstance(source, str) or not source:
+            raise ValueError("it has no source")
+        if not isinstance(dishes, str) or not dishes:
+            raise ValueError("it has no dishes")
+        order_dishes = [menu.named(name) for name in dishes.split(self.separator)]
+        if None in order_dishes:
+            raise ValueError(f"a dish is not on the menu ({dishes})")
+        if source == 'In Restaurant' and driver_wait_time is None:
+            driver_wait_time = 0
+        if not _number(driver_wait_time) or driver_wait_time < 0:
+            raise ValueError(f"driver_wait_time {driver_wait_time!r} is not a number of minutes")
+        return Order(order_id, order_time, order_dishes, source, driver_wait_time)
+
+
+def write_trace(path, n_orders, seed=0, batch_rows=65_536, start_time=None):
+    """Write a synthetic trace of n_orders, drawn like the simulation draws them, in batches."""
+    generator = OrderGenerator(seed)
+    order_time = start_time if start_time is not None else datetime(2023, 7, 3, 11, 0).timestamp()
+    schema = pa.schema([('order_id', pa.int64()), ('order_time', pa.float64()), ('dishes', pa.string()),
+                        ('source', pa.string()), ('driver_wait_time', pa.int64())])
+    parquet = path.endswith(('.parquet', '.pq'))
+    writer = pq.ParquetWriter(path, schema) if parquet else pa_csv.CSVWriter(path, schema)
+    try:
+        for first in range(0, n_orders, batch_rows):
+            rows = {name: [] for name in schema.names}
+            for order_id in range(first, min(first + batch_rows, n_orders)):
+                order = generator.make_order(order_id, order_time)
+                rows['order_id'].append(order_id)
+                rows['order_time'].append(order_time)
+                rows['dishes'].append(';'.join(dish.name for dish in order.dishes))
+                rows['source'].append(order.source)
+                rows['driver_wait_time'].append(order.driver_wait_time)
+                order_time += generator.next_gap()
+            writer.write_table(pa.Table.from_pydict(rows, schema=schema))
+    finally:
+        writer.close()
+
+
+class OutcomeWriter:
+    """Buffers per-order outcomes and writes them to CSV or Parquet batch_rows at a time."""
+
+    def __init__(self, path, batch_rows=65_536):
+        self.batch_rows = batch_rows
+        if path.endswith(('.parquet', '.pq')):
+            self.writer = pq.ParquetWriter(path, OUTCOME_SCHEMA)
+        else:
+            self.writer = pa_csv.CSVWriter(path, OUTCOME_SCHEMA)
+        self.rows = {name: [] for name in OUTCOME_SCHEMA.names}
+
+    def write(self, *values):
+        for column, value in zip(self.rows.values(), values):
+            column.append(value)
+        if len(self.rows['order_id']) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if self.rows['order_id']:
+            self.writer.write_table(pa.Table.from_pydict(self.rows, schema=OUTCOME_SCHEMA))
+            self.rows = {name: [] for name in OUTCOME_SCHEMA.names}
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+class TraceReplay(RestaurantSimulation):
+    """RestaurantSimulation fed from a stream of recorded orders instead of a generator.
+
+    Only the next arrival is scheduled at any time and completed orders are summarized on
+    the fly (and handed to `writer`), so nothing grows with the length of the trace. Wait
+    and driver wait percentiles are estimated from histograms.
+    """
+
+    def __init__(self, orders, writer=None, speedup=None, **kwargs):
+        self.orders = iter(orders)
+        first = next(self.orders, None)
+        super().__init__(0, start_time=first.order_time if first is not None else None, **kwargs)
+        self.next_order = first
+        self.writer = writer
+        self.speedup = speedup
+        self.completed_orders = 0
+        self.completed_groups = 0
+        self.batched_orders = 0
+        self.total_wait = 0.0
+        self.total_lead_time = 0.0
+        self.total_driver_wait = 0.0
+        self.driver_orders = 0
+        self.waits = Histogram(WAIT_BUCKETS)
+        self.driver_waits = Histogram(WAIT_BUCKETS)
+        self.first_time = first.order_time if first is not None else 0.0
+        self.last_time = self.first_time
+
+    def schedule_next_arrival(self):
+        order = self.next_order
+        if order is not None:
+            self.next_order = next(self.orders, None)
+            self.schedule(order.order_time, ARRIVAL, order)
+
+    def complete_group(self, station):
+        group = self.kitchen.complete(station)
+        self.completed_groups += 1
+        if len(group) > 1:
+            self.batched_orders += len(group) - 1
+        for order in group:
+            wait = order.start_time - order.order_time
+            lead_time = order.end_time - order.order_time
+            arrival = self.driver_arrival.pop(order.order_id, None)
+            driver_wait = max(0.0, order.end_time - arrival) if arrival is not None else math.nan
+            self.completed_orders += 1
+            self.total_wait += wait
+            self.total_lead_time += lead_time
+            self.waits.observe(wait)
+            if arrival is not None:
+                self.total_driver_wait += driver_wait
+                self.driver_waits.observe(driver_wait)
+                self.driver_orders += 1
+            self.last_time = max(self.last_time, order.end_time)
+            if self.writer is not None:
+                self.writer.write(order.order_id, order.source, order.order_time, order.start_time, order.end_time,
+                                  wait, lead_time, driver_wait, self.completed_groups, len(group))
+
+    def run(self):
+        """Replay the whole trace and return the number of completed orders."""
+        self.schedule_next_arrival()
+        started = time.perf_counter()
+        while self.events:
+            timestamp, _, kind, payload = heapq.heappop(self.events)
+            if self.speedup:
+                time.sleep(max(0.0, started + (timestamp - self.first_time) / self.speedup - time.perf_counter()))
+            self.clock.advance_to(timestamp)
+            if kind == ARRIVAL:
+                if payload.source != 'In Restaurant':
+                    self.driver_arrival[payload.order_id] = timestamp + payload.driver_wait_time * self.seconds_per_complexity
+                self.roo.add_order(payload)
+                self.schedule_next_arrival()
+            else:
+                self.complete_group(payload)
+            self.start_next_groups()
+        if self.writer is not None:
+            self.writer.flush()
+        return self.completed_orders
+
+    def summary(self):
+        if not self.completed_orders:
+            return {'orders': 0, 'groups': self.completed_groups}
+        elapsed = self.last_time - self.first_time
+        return {
+            'orders': self.completed_orders,
+            'groups': self.completed_groups,
+            'batched_orders': self.batched_orders,
+            'mean_wait': self.total_wait / self.completed_orders,
+            'p95_wait': self.waits.quantile(0.95),
+            'mean_lead_time': self.total_lead_time / self.completed_orders,
+            'mean_driver_wait': self.total_driver_wait / self.driver_orders if self.driver_orders else 0,
+            'p95_driver_wait': self.driver_waits.quantile(0.95),
+            'orders_per_hour': self.completed_orders / elapsed * 3600 if elapsed > 0 else 0,
+            'simulated_seconds': elapsed,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a CSV or Parquet order trace through ROO.")
+    parser.add_argument('trace')
+    parser.add_argument('--make-trace', action='store_true', help="write a synthetic trace to TRACE and exit")
+    parser.add_argument('--orders', type=int, default=100_000, help="rows of the synthetic trace")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="CSV or Parquet file for the per-order outcomes")
+    parser.add_argument('--batch-rows', type=int, default=65_536)
+    parser.add_argument('--speedup', type=float, help="pace the replay this many times faster than recorded")
+    parser.add_argument('--threshold', type=float, default=2)
+    parser.add_argument('--seconds-per-complexity', type=float, default=0.6)
+    parser.add_argument('--stations', type=int, default=1)
+    parser.add_argument('--kinetic', action='store_true')
+    args = parser.parse_args()
+
+    # Dishes of the trace are looked up by name on the dashboard's menu
+    for name, complexity in MENU:
+        Dish(name, complexity)
+    if args.make_trace:
+        write_trace(args.trace, args.orders, args.seed, args.batch_rows)
+        return
+
+    started = time.perf_counter()
+    writer = OutcomeWriter(args.output, args.batch_rows) if args.output else None
+    orders = TraceOrders(args.trace, args.batch_rows)
+    replay = TraceReplay(orders, writer=writer, speedup=args.speedup,
+                         threshold=args.threshold, seconds_per_complexity=args.seconds_per_complexity,
+                         stations=[Station(f'Station {i + 1}') for i in range(args.stations)], kinetic=args.kinetic)
+    try:
+        replay.run()
+    finally:
+        if writer is not None:
+            writer.close()
+    elapsed = time.perf_counter() - started
+    for key, value in replay.summary().items():
+        print(f"{key}: {round(value, 2) if isinstance(value, float) else value}")
+    print(f"skipped rows: {orders.skipped}")
+    print(f"wall time: {elapsed:.2f}s ({replay.completed_orders / elapsed:,.0f} orders/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""Headless discrete-event simulation of the restaurant kitchen.
+
+The simulation drives ROO with a virtual clock, so there is no sleeping and no UI. Every
+order leaves with its start_time and end_time set in virtual seconds.
+
+How fast it runs depends on whether the kitchen keeps up. The command line defaults to 0.05
+seconds per unit of complexity, where the queue stays short and 100k orders take a few
+seconds. At the dashboard's 0.6 a single station falls behind, the queue keeps growing and
+every rescoring pass walks all of it, so a few thousand orders already take seconds; add
+--stations or --kinetic there.
+
+    python -m order_simulation.simulation --orders 100000
+    python -m order_simulation.simulation --orders 3000 --seconds-per-complexity 0.6 --stations 10
+"""
+import argparse
+import heapq
+import random
+import time
+from datetime import datetime
+
+from order_optimization.batching import LookaheadBatcher
+from order_optimization.events import EventLog
+from order_optimization.order import Dish, Order
+from order_optimization.order_optimization import ROO
+from order_optimization.stations import KitchenExecutor, Station
+
+# Same menu and order sources as the dashboard (app.py)
+MENU = [('Margherita', 7), ('Pepperoni', 10), ('Four Cheese', 15), ('Vegan', 7), ('Supreme', 10), ('Mushroom', 8)]
+SOURCES = ['Bolt Foods', 'UberEats', 'Glovo', 'In Restaurant']
+SOURCE_WEIGHTS = [1.5, 1.5, 1.5, 4.5]
+
+ARRIVAL = 0
+COMPLETION = 1
+
+class VirtualClock:
+    """Clock that only moves when the simulation advances it. Call it to read the time."""
+
+    def __init__(self, start):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance_to(self, timestamp):
+        if timestamp > self.now:
+            self.now = timestamp
+
+
+class OrderGenerator:
+    """Seeded stream of orders drawn like app.py draws them."""
+
+    def __init__(self, seed=None, dishes=None, sources=SOURCES, source_weights=SOURCE_WEIGHTS,
+                 interarrival=(0.2, 3.5), driver_wait_time=(7, 20)):
+        self.rng = random.Random(seed)
+        self.dishes = dishes if dishes is not None else [Dish(name, complexity) for name, complexity in MENU]
+        self.sources = sources
+        self.source_weights = source_weights
+        self.interarrival = interarrival
+        self.driver_wait_time = driver_wait_time
+
+    def next_gap(self):
+        # Seconds until the next order arrives
+        return self.rng.uniform(*self.interarrival)
+
+    def make_order(self, order_id, order_time):
+        order_dishes = self.rng.sample(self.dishes, self.rng.randint(1, len(self.dishes)))
+        driver_wait_time = self.rng.randint(*self.driver_wait_time)
+        order_source = self.rng.choices(self.sources, weights=self.source_weights, k=1)[0]
+        return Order(order_id, order_time, order_dishes, order_source, driver_wait_time)
+
+
+class RestaurantSimulation:
+    """Event-driven run of ROO: order arrivals and group completions on a virtual clock.
+
+    By default the kitchen works like the dashboard: a single station cooking one group at
+    a time. Pass several Station objects to run groups in parallel. Every order of a group is
+    cooked at once and needs `seconds_per_complexity` per unit of complexity. Free stations
+    pick up work as soon as they are done, after re-optimizing the queue when
+    `optimize_before_start` is set (as app.py does on every tick).
+
+    Complexity and driver wait times are both in minutes in the dashboard, so a driver
+    arrives `driver_wait_time * seconds_per_complexity` after the order was placed.
+    """
+
+    def __init__(self, n_orders, seed=None, driver_weight=True, order_group_weight=True, order_priority_weight=True,
+                 threshold=2, seconds_per_complexity=0.6, optimize_before_start=True, vectorized=False,
+                 start_time=None, generator=None, stations=None, kinetic=False, buffer_time_percentage=0.1,
+                 group_factor=1.1, rush_hour_factor=1.1, batcher=None):
+        if start_time is None:
+            start_time = datetime(2023, 7, 3, 11, 0).timestamp()
+        self.n_orders = n_orders
+        self.threshold = threshold
+        self.seconds_per_complexity = seconds_per_complexity
+        self.optimize_before_start = optimize_before_start
+        self.clock = VirtualClock(start_time)
+        self.generator = generator if generator is not None else OrderGenerator(seed)
+        self.roo = ROO(driver_weight=driver_weight, order_group_weight=order_group_weight,
+                       order_priority_weight=order_priority_weight, vectorized=vectorized, clock=self.clock,
+                       kinetic=kinetic, seconds_per_minute=seconds_per_complexity,
+                       buffer_time_percentage=buffer_time_percentage, group_factor=group_factor,
+                       rush_hour_factor=rush_hour_factor, batcher=batcher)
+        if stations is None:
+            stations = [Station('Kitchen')]
+        self.kitchen = KitchenExecutor(self.roo, stations, threshold, seconds_per_complexity)
+        self.events = []
+        self.sequence = 0
+        self.completed = []
+        self.driver_arrival = {}
+        self.groups = 0
+
+    def schedule(self, timestamp, kind, payload=None):
+        # The sequence number keeps events at the same instant in scheduling order
+        heapq.heappush(self.events, (timestamp, self.sequence, kind, payload))
+        self.sequence += 1
+
+    def start_next_groups(self):
+        if not self.roo.orders or not any(station.free for station in self.kitchen.stations):
+            return
+        if self.optimize_before_start:
+            self.roo.optimize_orders()
+        for station, finish_time in self.kitchen.dispatch():
+            self.groups += 1
+            self.schedule(finish_time, COMPLETION, station)
+
+    def complete_group(self, station):
+        self.completed.extend(self.kitchen.complete(station))
+
+    def run(self):
+        """Run until every order has been completed and return the completed orders."""
+        if self.n_orders > 0:
+            self.schedule(self.clock.now, ARRIVAL, 0)
+        while self.events:
+            timestamp, _, kind, payload = heapq.heappop(self.events)
+            self.clock.advance_to(timestamp)
+            if kind == ARRIVAL:
+                order = self.generator.make_order(payload, timestamp)
+                if order.source != 'In Restaurant':
+                    self.driver_arrival[order.order_id] = timestamp + order.driver_wait_time * self.seconds_per_complexity
+                self.roo.add_order(order)
+                if payload + 1 < self.n_orders:
+                    self.schedule(timestamp + self.generator.next_gap(), ARRIVAL, payload + 1)
+            else:
+                self.complete_group(payload)
+            self.start_next_groups()
+        return self.completed
+
+    def summary(self):
+        """Aggregate waiting and preparation times of the completed orders, in virtual seconds."""
+        if not self.completed:
+            return {'orders': 0, 'groups': self.groups}
+        waits = sorted(order.start_time - order.order_time for order in self.completed)
+        lead_times = sorted(order.end_time - order.order_time for order in self.completed)
+        first = min(order.order_time for order in self.completed)
+        last = max(order.end_time for order in self.completed)
+        # How long drivers stood waiting for food that was not ready when they arrived
+        driver_waits = [max(0, order.end_time - self.driver_arrival[order.order_id])
+                        for order in self.completed if order.order_id in self.driver_arrival]
+        return {
+            'orders': len(self.completed),
+            'groups': self.groups,
+            'batched_orders': len(self.completed) - self.groups,
+            'mean_wait': sum(waits) / len(waits),
+            'p95_wait': waits[int(0.95 * (len(waits) - 1))],
+            'mean_lead_time': sum(lead_times) / len(lead_times),
+            'p95_lead_time': lead_times[int(0.95 * (len(lead_times) - 1))],
+            'mean_driver_wait': sum(driver_waits) / len(driver_waits) if driver_waits else 0,
+            'orders_per_hour': len(self.completed) / (last - first) * 3600 if last > first else 0,
+            'simulated_seconds': last - first,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the restaurant simulation without the dashboard.")
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--threshold', type=float, default=2)
+    parser.add_argument('--seconds-per-complexity', type=float, default=0.05,
+                        help="cooking time per unit of complexity; the dashboard uses 0.6")
+    parser.add_argument('--stations', type=int, default=1)
+    parser.add_argument('--vectorized', action='store_true')
+    parser.add_argument('--kinetic', action='store_true', help="use the time-parameterized priority queue")
+    parser.add_argument('--capacity', type=int, default=2, help="largest group a station cooks")
+    parser.add_argument('--lookahead', type=int, help="plan groups over this many top orders instead of greedy pairing")
+    parser.add_argument('--budget-ms', type=float, default=5, help="time limit of one lookahead decision")
+    parser.add_argument('--events', help="write the order lifecycle event log to this Parquet file")
+    parser.add_argument('--metrics', help="write the ROO metrics in Prometheus text format to this file")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    stations = [Station(f'Station {i + 1}', capacity=args.capacity) for i in range(args.stations)]
+    batcher = None
+    if args.lookahead:
+        batcher = LookaheadBatcher(window=args.lookahead, capacity=args.capacity, budget=args.budget_ms / 1000,
+                                   stations=args.stations)
+    simulation = RestaurantSimulation(args.orders, seed=args.seed, threshold=args.threshold,
+                                      seconds_per_complexity=args.seconds_per_complexity, vectorized=args.vectorized,
+                                      stations=stations, kinetic=args.kinetic, batcher=batcher)
+    if args.metrics:
+        simulation.roo.enable_metrics(seconds_per_minute=args.seconds_per_complexity)
+    events = EventLog(simulation.roo, seconds_per_minute=args.seconds_per_complexity) if args.events else None
+    simulation.run()
+    elapsed = time.perf_counter() - started
+    for key, value in simulation.summary().items():
+        print(f"{key}: {round(value, 2) if isinstance(value, float) else value}")
+    print(f"wall time: {elapsed:.2f}s ({args.orders / elapsed:,.0f} orders/s)")
+    if batcher is not None:
+        print(f"lookahead: {batcher.decisions} decisions, {batcher.fallbacks} over budget, "
+              f"slowest {batcher.slowest * 1e3:.2f}ms")
+    if events is not None:
+        kpis = events.kpis()
+        print(f"last hour: prep p50 {kpis['prep_p50']:.2f}s p95 {kpis['prep_p95']:.2f}s, "
+              f"{kpis['completed_per_hour']:.0f} orders/h, driver wait "
+              + ', '.join(f"{source} {wait:.2f}s" for source, wait in kpis['driver_wait_by_source'].items()))
+        events.write_parquet(args.events)
+    if args.metrics:
+        simulation.roo.metrics.write_prometheus(args.metrics, events.prometheus_lines() if events is not None else ())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Parameter sweeps over the ROO policy settings.
+
+Every configuration is run on the same seeded workloads in a pool of worker processes, and
+the KPIs are averaged over the seeds into one comparison table:
+
+    python -m order_simulation.sweep --threshold 1 2 4 --group-factor 1.0 1.1 1.3 --output sweep.csv
+    python -m order_simulation.sweep --random 500 --threshold 0.5 8 --rush-hour-factor 1.0 1.5
+
+A grid runs every combination of the listed values. With --random N, N configurations are
+drawn instead: numbers uniformly between the smallest and largest value given, flags from
+the values given.
+
+The workload defaults to 0.05 seconds per unit of complexity on one station, which keeps the
+kitchen busy (utilization around 0.9) without falling behind. Once utilization reaches 1 the
+queue grows for the whole run, every configuration mostly measures that backlog and runs
+get slow; check the utilization column when changing --seconds-per-complexity or --stations.
+"""
+import argparse
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from order_optimization.stations import Station
+from .simulation import RestaurantSimulation
+
+# Settings a configuration can set, with the values of the dashboard's default run
+DEFAULTS = {
+    'driver_weight': True,
+    'order_group_weight': True,
+    'order_priority_weight': True,
+    'threshold': 2.0,
+    'group_factor': 1.1,
+    'rush_hour_factor': 1.1,
+}
+FLAGS = ('driver_weight', 'order_group_weight', 'order_priority_weight')
+KPIS = ('mean_wait', 'p95_wait', 'mean_lead_time', 'p95_lead_time', 'mean_driver_wait', 'batch_rate', 'orders_per_hour',
+        'utilization')
+
+def grid(values):
+    """Every combination of the values given per setting, as configuration dicts."""
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*(values[name] for name in names))]
+
+def random_search(values, n, seed=0):
+    """n configurations drawn from the values given per setting."""
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(n):
+        config = {}
+        for name, options in values.items():
+            if name in FLAGS or len(options) == 1:
+                config[name] = rng.choice(options)
+            else:
+                config[name] = rng.uniform(min(options), max(options))
+        configs.append(config)
+    return configs
+
+def run_config(task):
+    """Simulate one configuration on one seed and return its KPIs (runs in a worker process)."""
+    config_id, config, seed, n_orders, seconds_per_complexity, stations, start_time = task
+    settings = dict(DEFAULTS, **config)
+    simulation = RestaurantSimulation(
+        n_orders, seed=seed, driver_weight=settings['driver_weight'], order_group_weight=settings['order_group_weight'],
+        order_priority_weight=settings['order_priority_weight'], threshold=settings['threshold'],
+        seconds_per_complexity=seconds_per_complexity, start_time=start_time,
+        stations=[Station(f'Station {i + 1}') for i in range(stations)], group_factor=settings['group_factor'],
+        rush_hour_factor=settings['rush_hour_factor'])
+    simulation.run()
+    summary = simulation.summary()
+    summary['batch_rate'] = summary['batched_orders'] / summary['orders'] if summary['orders'] else 0
+    if summary.get('simulated_seconds'):
+        # Share of the run the stations spent cooking; at 1 the queue only grows
+        busy_time = sum(station.busy_time for station in simulation.kitchen.stations)
+        summary['utilization'] = busy_time / (stations * summary['simulated_seconds'])
+    return dict(config, config_id=config_id, seed=seed, **{kpi: summary.get(kpi, 0) for kpi in KPIS})
+
+def sweep(configs, seeds=(0, 1, 2), n_orders=2000, seconds_per_complexity=0.05, stations=1, start_time=None,
+          workers=None):
+    """Run every configuration on every seed and return a DataFrame with one row per configuration.
+
+    KPI columns are means over the seeds; the *_std columns give their spread.
+    """
+    if start_time is None:
+        # Lunch service, so the rush-hour factor takes effect
+        start_time = datetime(2023, 7, 3, 11, 30).timestamp()
+    tasks = [(config_id, config, seed, n_orders, seconds_per_complexity, stations, start_time)
+             for config_id, config in enumerate(configs) for seed in seeds]
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        results = [run_config(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            # Several tasks per message keep the pickling overhead down on short runs
+            results = list(pool.map(run_config, tasks, chunksize=max(1, len(tasks) // (8 * workers))))
+
+    runs = pd.DataFrame(results)
+    settings = [name for name in runs.columns if name not in KPIS and name not in ('config_id', 'seed')]
+    grouped = runs.groupby('config_id')
+    table = grouped[settings].first().join(grouped[list(KPIS)].mean())
+    table = table.join(grouped[['mean_lead_time', 'mean_driver_wait']].std().add_suffix('_std'))
+    return table
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep ROO settings over seeded simulations.")
+    parser.add_argument('--threshold', type=float, nargs='+', default=[DEFAULTS['threshold']])
+    parser.add_argument('--group-factor', type=float, nargs='+', default=[DEFAULTS['group_factor']])
+    parser.add_argument('--rush-hour-factor', type=float, nargs='+', default=[DEFAULTS['rush_hour_factor']])
+    for flag in FLAGS:
+        parser.add_argument(f"--{flag.replace('_', '-')}", choices=('yes', 'no', 'both'), default='yes')
+    parser.add_argument('--random', type=int, help="draw this many configurations instead of the full grid")
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0, 1, 2])
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--seconds-per-complexity', type=float, default=0.05)
+    parser.add_argument('--stations', type=int, default=1)
+    parser.add_argument('--workers', type=int, help="worker processes, all cores by default")
+    parser.add_argument('--sort', default='mean_lead_time', choices=KPIS)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--output', help="write the full table to this CSV file")
+    args = parser.parse_args()
+
+    values = {
+        'threshold': args.threshold,
+        'group_factor': args.group_factor,
+        'rush_hour_factor': args.rush_hour_factor,
+    }
+    for flag in FLAGS:
+        choice = getattr(args, flag)
+        values[flag] = [True, False] if choice == 'both' else [choice == 'yes']
+    configs = random_search(values, args.random) if args.random else grid(values)
+
+    started = time.perf_counter()
+    table = sweep(configs, args.seeds, args.orders, args.seconds_per_complexity, args.stations, workers=args.workers)
+    elapsed = time.perf_counter() - started
+    table = table.sort_values(args.sort)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(table.head(args.top).round(3).to_string())
+    print(f"{len(configs)} configurations x {len(args.seeds)} seeds in {elapsed:.1f}s")
+    if args.output:
+        table.to_csv(args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""Batched restaurant environment for reinforcement learning.
+
+BatchedOrderEnv steps `num_envs` independent kitchens in lockstep. All queue state lives in
+preallocated NumPy arrays of shape (num_envs, max_queue), so one step costs a fixed number of
+array operations whatever the number of environments. The action of every environment is the
+queue slot of the order to start next; the kitchen batches it with the longest-waiting order
+that ROO.dishes_in_common would accept and cooks the group before the next decision.
+
+    python -m order_simulation.vector_env --envs 256
+"""
+import argparse
+import time
+
+import numpy as np
+
+from .simulation import MENU, SOURCES, SOURCE_WEIGHTS
+
+# Observation features per queue slot
+FEATURES = ('valid', 'wait_time', 'complexity', 'driver_time_left', 'source', 'n_dishes')
+
+class BatchedOrderEnv:
+    """K restaurant queues stepped together.
+
+    Observations are float32 arrays of shape (num_envs, max_queue, len(FEATURES)) with empty
+    slots zeroed, returned with a boolean action mask of shape (num_envs, max_queue). The
+    reward of a step is minus the minutes the started orders waited in the queue, plus the
+    minutes drivers stand waiting for them when `driver_weight` is set. Each episode serves
+    `episode_orders` orders; finished environments are reset automatically and their last
+    observation is returned in info['final_observation'].
+    """
+
+    def __init__(self, num_envs=64, max_queue=64, episode_orders=50, seconds_per_complexity=0.6,
+                 interarrival=(0.2, 3.5), driver_wait_time=(7, 20), driver_weight=True, batching=True,
+                 menu=MENU, source_weights=SOURCE_WEIGHTS, seed=None):
+        self.num_envs = num_envs
+        self.max_queue = max_queue
+        self.episode_orders = episode_orders
+        self.seconds_per_complexity = seconds_per_complexity
+        self.interarrival = interarrival
+        self.driver_wait_time = driver_wait_time
+        self.driver_weight = driver_weight
+        self.batching = batching
+        self.rng = np.random.default_rng(seed)
+
+        # Menu tables indexed by dish bitmask
+        self.n_menu = len(menu)
+        self.dish_bits = 1 << np.arange(self.n_menu, dtype=np.int64)
+        masks = np.arange(1 << self.n_menu, dtype=np.int64)
+        chosen = (masks[:, None] & self.dish_bits) != 0
+        self.mask_complexity = (chosen * np.array([complexity for _, complexity in menu])).sum(axis=1).astype(np.float64)
+        self.mask_popcount = chosen.sum(axis=1)
+        weights = np.array(source_weights, dtype=np.float64)
+        self.source_cdf = np.cumsum(weights / weights.sum())
+        # Same source codes as OrderEnv.encode_source: Bolt Foods 1, UberEats 2, Glovo 3, In Restaurant 4
+        self.in_restaurant = SOURCES.index('In Restaurant')
+
+        shape = (num_envs, max_queue)
+        self.valid = np.zeros(shape, dtype=bool)
+        self.order_time = np.zeros(shape)
+        self.complexity = np.zeros(shape)
+        self.driver_arrival = np.zeros(shape)
+        self.source = np.zeros(shape, dtype=np.int8)
+        self.dish_mask = np.zeros(shape, dtype=np.int64)
+        self.now = np.zeros(num_envs)
+        self.next_arrival = np.zeros(num_envs)
+        self.arrived = np.zeros(num_envs, dtype=np.int64)
+        self.dropped = np.zeros(num_envs, dtype=np.int64)
+        self.rows = np.arange(num_envs)
+        self.observation = np.zeros(shape + (len(FEATURES),), dtype=np.float32)
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self._reset_envs(self.rows)
+        return self._observe(), {}
+
+    def _reset_envs(self, envs):
+        self.valid[envs] = False
+        self.now[envs] = 0
+        self.next_arrival[envs] = 0
+        self.arrived[envs] = 0
+        self.dropped[envs] = 0
+        self._fill(envs)
+
+    def _arrive(self, envs):
+        # One new order for each of these environments, drawn like app.py draws them
+        n = len(envs)
+        n_dishes = self.rng.integers(1, self.n_menu + 1, size=n)
+        ranks = self.rng.random((n, self.n_menu)).argsort(axis=1).argsort(axis=1)
+        masks = ((ranks < n_dishes[:, None]) * self.dish_bits).sum(axis=1)
+        sources = np.searchsorted(self.source_cdf, self.rng.random(n), side='right')
+        driver_wait = self.rng.integers(self.driver_wait_time[0], self.driver_wait_time[1] + 1, size=n)
+        order_time = self.next_arrival[envs]
+        self.arrived[envs] += 1
+        self.next_arrival[envs] += self.rng.uniform(*self.interarrival, size=n)
+
+        # First empty slot of each queue; orders arriving at a full queue are dropped
+        slots = self.valid[envs].argmin(axis=1)
+        free = ~self.valid[envs, slots]
+        self.dropped[envs[~free]] += 1
+        envs, slots = envs[free], slots[free]
+        self.valid[envs, slots] = True
+        self.order_time[envs, slots] = order_time[free]
+        self.complexity[envs, slots] = self.mask_complexity[masks[free]]
+        self.dish_mask[envs, slots] = masks[free]
+        self.source[envs, slots] = sources[free]
+        self.driver_arrival[envs, slots] = np.where(
+            sources[free] == self.in_restaurant, np.inf,
+            order_time[free] + driver_wait[free] * self.seconds_per_complexity)
+
+    def _fill(self, envs):
+        # Add every arrival up to the current time; an idle kitchen waits for the next order
+        while len(envs):
+            pending = self.arrived[envs] < self.episode_orders
+            idle = pending & ~self.valid[envs].any(axis=1)
+            self.now[envs[idle]] = np.maximum(self.now[envs[idle]], self.next_arrival[envs[idle]])
+            due = pending & (self.next_arrival[envs] <= self.now[envs])
+            envs = envs[due]
+            if len(envs):
+                self._arrive(envs)
+
+    def _observe(self):
+        obs = self.observation
+        valid = self.valid
+        obs[..., 0] = valid
+        obs[..., 1] = np.where(valid, self.now[:, None] - self.order_time, 0)
+        obs[..., 2] = np.where(valid, self.complexity, 0)
+        driver_left = self.driver_arrival - self.now[:, None]
+        obs[..., 3] = np.where(valid & np.isfinite(driver_left), driver_left, 0)
+        obs[..., 4] = np.where(valid, self.source + 1, 0)
+        obs[..., 5] = np.where(valid, self.mask_popcount[self.dish_mask], 0)
+        # The buffer is refilled on every step, so callers get their own copy
+        return obs.copy(), valid.copy()
+
+    def step(self, actions):
+        """Start the order in slot actions[k] in every environment k.
+
+        Returns (observation, action_mask), rewards, terminated, truncated, info. Actions that
+        point at an empty slot are replaced by the first queued order.
+        """
+        rows = self.rows
+        actions = np.asarray(actions, dtype=np.int64)
+        valid = self.valid
+        busy = valid.any(axis=1)
+        invalid = ~valid[rows, actions]
+        actions = np.where(invalid, valid.argmax(axis=1), actions)
+
+        now = self.now
+        rewards = np.zeros(self.num_envs)
+        started = np.zeros(valid.shape, dtype=bool)
+        started[rows, actions] = busy
+
+        if self.batching:
+            # Batch-mate as in ROO.dishes_in_common: the smaller dish set is contained in the
+            # other one and has at most 3 dishes; the longest-waiting one is taken
+            chosen_mask = self.dish_mask[rows, actions][:, None]
+            popcount = self.mask_popcount[self.dish_mask]
+            subset = ((self.dish_mask & ~chosen_mask) == 0) & (popcount <= 3)
+            superset = ((chosen_mask & ~self.dish_mask) == 0) & (self.mask_popcount[chosen_mask] <= 3)
+            candidates = valid & ~started & (subset | superset)
+            candidate_time = np.where(candidates, self.order_time, np.inf)
+            mates = candidate_time.argmin(axis=1)
+            has_mate = busy & np.isfinite(candidate_time[rows, mates])
+            started[rows[has_mate], mates[has_mate]] = True
+
+        duration = np.where(started, self.complexity, 0).max(axis=1) * self.seconds_per_complexity
+        end = now + duration
+        queue_wait = np.where(started, now[:, None] - self.order_time, 0).sum(axis=1)
+        rewards -= queue_wait / 60
+        if self.driver_weight:
+            driver_wait = np.where(started, np.maximum(0, end[:, None] - self.driver_arrival), 0).sum(axis=1)
+            rewards -= driver_wait / 60
+        valid &= ~started
+        self.now[:] = end
+
+        self._fill(rows)
+
+        terminated = (self.arrived >= self.episode_orders) & ~valid.any(axis=1)
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        info = {'invalid_actions': invalid & busy, 'dropped': self.dropped.copy()}
+        if terminated.any():
+            done_envs = rows[terminated]
+            info['final_observation'] = self._observe()[0][done_envs]
+            self._reset_envs(done_envs)
+        return self._observe(), rewards, terminated, truncated, info
+
+    def roo_actions(self, order_group_weight=True, order_priority_weight=True, group_factor=1.1):
+        """Slots ROO would start next, using its priority formula without the driver-wait terms."""
+        wait_time = self.now[:, None] - self.order_time
+        if order_group_weight:
+            wait_time = np.where(self.mask_popcount[self.dish_mask] > 3, wait_time * group_factor, wait_time)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if order_priority_weight:
+                priority = -1 * wait_time / np.log(self.complexity + 1)
+            else:
+                priority = -1 * wait_time / np.exp((1 / self.complexity) + 1)
+        return np.where(self.valid, priority, np.inf).argmin(axis=1)
+
+    def random_actions(self):
+        # A uniformly random queued order per environment
+        scores = np.where(self.valid, self.rng.random(self.valid.shape), -1)
+        return scores.argmax(axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure BatchedOrderEnv steps per second.")
+    parser.add_argument('--envs', type=int, default=256)
+    parser.add_argument('--steps', type=int, default=2000)
+    parser.add_argument('--policy', choices=('roo', 'random'), default='roo')
+    args = parser.parse_args()
+
+    env = BatchedOrderEnv(num_envs=args.envs, seed=0)
+    env.reset()
+    episodes = 0
+    total_reward = 0.0
+    started = time.perf_counter()
+    for _ in range(args.steps):
+        actions = env.roo_actions() if args.policy == 'roo' else env.random_actions()
+        _, rewards, terminated, _, _ = env.step(actions)
+        total_reward += rewards.sum()
+        episodes += terminated.sum()
+    elapsed = time.perf_counter() - started
+    print(f"{args.envs * args.steps / elapsed:,.0f} env-steps/s over {args.envs} environments")
+    if episodes:
+        print(f"{episodes} episodes, mean episode reward {total_reward / episodes:.1f}")
+
+
+if __name__ == '__main__':
+    main()
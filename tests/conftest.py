@@ -0,0 +1,24 @@
+import pytest
+
+from order_optimization.order_optimization import ROO
+from order_simulation.simulation import OrderGenerator, VirtualClock
+
+START = 1_700_000_000.0
+
+@pytest.fixture
+def queued_roo():
+    """Factory of ROOs on a virtual clock holding `n_orders` seeded orders, rescored once.
+
+    make(seed, n_orders, **settings) returns (roo, generator); the generator's rng drives
+    whatever the test does next.
+    """
+    def make(seed, n_orders, **settings):
+        generator = OrderGenerator(seed)
+        clock = VirtualClock(START)
+        roo = ROO(True, True, True, clock=clock, seconds_per_minute=0.6, **settings)
+        for order_id in range(n_orders):
+            clock.advance_to(clock.now + generator.next_gap())
+            roo.add_order(generator.make_order(order_id, clock.now))
+        roo.optimize_orders()
+        return roo, generator
+    return make
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from order_optimization.batching import LookaheadBatcher
+from order_optimization.order import Dish
+from order_simulation.simulation import MENU
+
+def feasible(roo, group, capacity):
+    # A lead every other member can be batched with, as in take_group
+    if not 1 <= len(group) <= capacity or len({order.order_id for order in group}) != len(group):
+        return False
+    return any(all(other is lead or roo.dishes_in_common(lead, other) for other in group) for lead in group)
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('window, exact', [(12, 6), (24, 8)])
+def test_choose_returns_feasible_queued_groups(queued_roo, seed, window, exact):
+    # A budget no plan runs out of, so every decision returns a group to check
+    batcher = LookaheadBatcher(window=window, capacity=4, exact=exact, budget=5)
+    roo, _ = queued_roo(seed, 80, batcher=batcher)
+    while roo.orders:
+        group = batcher.choose(roo, 4)
+        assert group is not None
+        assert all(order.order_id in roo.orders for order in group)
+        assert feasible(roo, group, 4)
+        # take_group removes the group batcher.choose picks again
+        started = roo.take_group(capacity=4)
+        assert feasible(roo, started, 4)
+        assert all(order.order_id not in roo.orders for order in started)
+
+
+def test_dish_mask_limits_the_candidates(queued_roo):
+    batcher = LookaheadBatcher(window=12, capacity=4, budget=0.05)
+    roo, _ = queued_roo(0, 60, batcher=batcher)
+    dish_mask = Dish(*MENU[0]).bit | Dish(*MENU[3]).bit
+    group = batcher.choose(roo, 4, dish_mask)
+    assert all(not order.dish_mask & ~dish_mask for order in group)
+
+
+def test_choose_stays_within_its_budget(queued_roo):
+    # A window the exact planner could never finish; the decision must give up or cut the plan down in time
+    budget = 0.002
+    batcher = LookaheadBatcher(window=64, capacity=4, exact=16, budget=budget)
+    roo, _ = queued_roo(1, 400, batcher=batcher)
+    slowest = 0.0
+    for _ in range(30):
+        started = time.perf_counter()
+        group = batcher.choose(roo, 4)
+        slowest = max(slowest, time.perf_counter() - started)
+        if group is not None:
+            assert feasible(roo, group, 4)
+    # Generous slack for scheduler hiccups; planning 16 orders exactly takes seconds
+    assert slowest < budget + 0.05
+    assert batcher.decisions == 30
+
+
+def test_exact_planning_mostly_fits_the_default_budget(queued_roo):
+    batcher = LookaheadBatcher(window=24, capacity=4, exact=10)
+    roo, _ = queued_roo(2, 200, batcher=batcher)
+    for _ in range(100):
+        if not roo.orders:
+            break
+        roo.take_group(capacity=4)
+    assert batcher.fallbacks <= batcher.decisions // 10
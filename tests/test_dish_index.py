@@ -0,0 +1,47 @@
+import pytest
+
+def brute_force_match(roo, order, priority, threshold):
+    # The scan start_order used to do: the best queued order inside the band that shares dishes
+    best = None
+    for candidate_priority, candidate in roo.orders:
+        if candidate is order:
+            continue
+        if roo.priority_closeness(priority, candidate_priority) > threshold:
+            continue
+        if not roo.dishes_in_common(order, candidate):
+            continue
+        if best is None or candidate_priority < best[0]:
+            best = (candidate_priority, candidate)
+    return best
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('threshold', [0.5, 2, 20])
+def test_best_match_agrees_with_scan(queued_roo, seed, threshold):
+    roo, _ = queued_roo(seed, 300)
+    for _ in range(40):
+        priority, order = roo.orders.pop()
+        roo.dish_index.remove(order.order_id)
+        found = roo.dish_index.best_match(roo, order, priority, threshold)
+        expected = brute_force_match(roo, order, priority, threshold)
+        if expected is None:
+            assert found is None
+        else:
+            assert found is not None
+            assert roo.orders.priority(found.order_id) == expected[0]
+            assert roo.dishes_in_common(order, found)
+
+
+def test_take_group_matches_scan(queued_roo):
+    roo, _ = queued_roo(7, 200)
+    while roo.orders:
+        priority, order = roo.orders.peek()
+        expected = brute_force_match(roo, order, priority, 2)
+        priorities = {queued.order_id: queued_priority for queued_priority, queued in roo.orders}
+        group = roo.take_group(threshold=2)
+        assert group[0] is order
+        if expected is None:
+            assert len(group) == 1
+        else:
+            assert len(group) == 2
+            assert priorities[group[1].order_id] == expected[0]
@@ -0,0 +1,70 @@
+from order_optimization.events import EventLog
+from order_optimization.order import Dish, Order
+from order_optimization.order_optimization import ROO
+from order_simulation.live import LiveSimulation
+from order_simulation.simulation import MENU, VirtualClock
+
+START = 1_700_000_000.0
+
+
+def test_process_group_feeds_the_event_log():
+    clock = VirtualClock(START)
+    roo = ROO(True, True, True, clock=clock)
+    events = EventLog(roo)
+    margherita, vegan = Dish(*MENU[0]), Dish(*MENU[3])
+    roo.add_order(Order(0, START, [margherita], 'Glovo', 10))
+    roo.add_order(Order(1, START, [margherita, vegan], 'In Restaurant', 10))
+    roo.start_order(threshold = 10)
+    group = list(roo.current_order)
+    assert len(group) == 2
+
+    while max(order.total_complexity for order in group):
+        clock.advance_to(clock.now + 1)
+        roo.process_group()
+    for order in group:
+        roo.complete_order(order.order_id)
+
+    counts = events.kpis()['events']
+    assert counts['tick'] == 2 * margherita.complexity + vegan.complexity
+    assert counts['completed'] == 2
+    remaining = {}
+    for row in events.table().to_pylist():
+        if row['kind'] == 'tick':
+            remaining.setdefault(row['order_id'], []).append(row['value'])
+    assert remaining == {order.order_id: [float(left) for left in reversed(range(order.dish_complexity))]
+                         for order in group}
+
+
+def test_live_simulation_ticks_go_through_roo():
+    simulation = LiveSimulation(4, seconds_per_complexity=0.001, seed=0, metrics=True)
+    simulation.generator.interarrival = (0, 0.001)
+    orders = []
+    make_order = simulation.generator.make_order
+
+    def record(*args):
+        orders.append(make_order(*args))
+        return orders[-1]
+    simulation.generator.make_order = record
+    simulation.start()
+    simulation._thread.join(30)
+    assert simulation.finished
+
+    counts = simulation.events.kpis()['events']
+    assert counts['queued'] == 4
+    assert counts['completed'] == 4
+    assert counts['tick'] == sum(sum(dish.complexity for dish in order.dishes) for order in orders)
+    assert simulation.roo.metrics.latency['process_group'].count > 0
+
+
+def test_driver_arrival_is_read_before_scoring():
+    roo = ROO(True, True, True, clock=VirtualClock(START))
+    roo.enable_metrics()
+    events = EventLog(roo)
+    margherita = Dish(*MENU[0])
+    roo.add_order(Order(0, START, [margherita], 'Glovo', 10))
+    roo.add_order(Order(1, START, [margherita], 'In Restaurant', 10))
+    assert roo.orders.get(0).driver_wait_time < 10
+    assert events.driver_arrival == roo.metrics.driver_arrival == {0: START + 10 * events.seconds_per_minute}
+
+    roo.modify_order(0, driver_wait_time=20)
+    assert events.driver_arrival[0] == START + 20 * events.seconds_per_minute
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from order_optimization.heap import IndexedHeap
+from order_simulation.simulation import MENU, OrderGenerator
+
+START = 1_700_000_000.0
+
+def check(heap, expected):
+    # expected: order_id -> priority, the scan the heap replaces
+    assert len(heap) == len(expected)
+    assert {order.order_id: priority for priority, order in heap} == expected
+    for order_id, index in heap.position.items():
+        assert heap[index][1].order_id == order_id
+    priorities = [priority for priority, _ in heap.iter_sorted()]
+    assert priorities == sorted(expected.values())
+    if expected:
+        assert heap.peek()[0] == min(expected.values())
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_heap_agrees_with_a_scan(seed):
+    rng = random.Random(seed)
+    generator = OrderGenerator(seed)
+    heap = IndexedHeap()
+    expected = {}
+    for order_id in range(400):
+        action = rng.random()
+        if action < 0.5 or not expected:
+            priority = rng.uniform(-100, 0)
+            heap.push(priority, generator.make_order(order_id, START))
+            expected[order_id] = priority
+        elif action < 0.65:
+            priority, order = heap.pop()
+            assert priority == min(expected.values())
+            del expected[order.order_id]
+        elif action < 0.8:
+            order_id = rng.choice(list(expected))
+            assert heap.remove(order_id)[0] == expected.pop(order_id)
+        else:
+            order_id = rng.choice(list(expected))
+            expected[order_id] = rng.uniform(-100, 0)
+            heap.update(order_id, expected[order_id])
+        check(heap, expected)
+    assert heap.remove(-1) is None
+
+
+def test_modify_and_cancel_keep_the_queue_ordered(queued_roo):
+    roo, generator = queued_roo(3, 200)
+    rng, clock, dishes = generator.rng, roo.clock, generator.dishes
+    for _ in range(150):
+        clock.advance_to(clock.now + 1)
+        order_id = rng.choice([order.order_id for _, order in roo.orders])
+        if rng.random() < 0.3:
+            order = roo.cancel_order(order_id)
+            assert order.order_id == order_id and order_id not in roo.orders
+            assert order_id not in roo.dish_index.signatures
+        else:
+            roo.modify_order(order_id, rng.sample(dishes, rng.randint(1, len(MENU))), rng.randint(7, 20))
+            assert roo.dish_index.signatures[order_id] == roo.orders.get(order_id).dish_mask
+        check(roo.orders, {order.order_id: priority for priority, order in roo.orders})
+    assert roo.cancel_order(-1) is None
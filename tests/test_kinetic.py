@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+from order_optimization.kinetic import KineticHeap
+from order_optimization.order import Dish, Order
+from order_optimization.order_optimization import ROO
+from order_optimization.priority import PriorityModel
+from order_simulation.simulation import MENU, OrderGenerator, VirtualClock
+
+START = 1_700_000_000.0
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_heap_order_follows_model(seed):
+    rng = random.Random(seed)
+    generator = OrderGenerator(seed)
+    model = PriorityModel(True, True, True, seconds_per_minute=0.6, rush_hour_factor=1.3)
+    heap = KineticHeap(model)
+    now = START
+    order_id = 0
+    for _ in range(300):
+        action = rng.random()
+        if action < 0.5:
+            heap.push(None, generator.make_order(order_id, now))
+            order_id += 1
+        elif action < 0.6 and heap:
+            heap.remove(rng.choice(list(heap))[1].order_id)
+        else:
+            now += rng.uniform(0, 30)
+            heap.advance(now, model.rush_multiplier(now))
+        if not heap:
+            continue
+        entries = list(heap.iter_sorted())
+        priorities = [priority for priority, _ in entries]
+        assert priorities == sorted(priorities)
+        for priority, order in entries:
+            assert priority == pytest.approx(model.priority(order, now), rel=1e-9, abs=1e-6)
+        assert heap.peek()[0] == pytest.approx(min(model.priority(order, now) for _, order in heap), rel=1e-9, abs=1e-6)
+
+
+def test_new_bucket_starts_at_the_main_heap_time_and_scale():
+    clock = VirtualClock(START)
+    roo = ROO(driver_weight=True, order_group_weight=True, order_priority_weight=True, clock=clock, kinetic=True,
+              seconds_per_minute=0.6)
+    # Every hour is rush hour, so the main heap is scaled
+    roo.model.rush_hours = frozenset(range(24))
+    margherita = Dish(*MENU[0])
+    roo.add_order(Order(0, clock.now, [margherita], 'In Restaurant', 0))
+    clock.advance_to(START + 600)
+    roo.optimize_orders()
+    assert roo.orders.scale == roo.model.rush_hour_factor
+
+    # An order with a dish signature no bucket has yet
+    order = Order(1, clock.now, [Dish(*MENU[1]), Dish(*MENU[2])], 'Glovo', 12)
+    roo.add_order(order)
+    bucket = roo.dish_index.buckets[order.dish_mask]
+    assert bucket.now == roo.orders.now
+    assert bucket.scale == roo.orders.scale
+    for order_id in (0, 1):
+        signature = roo.dish_index.signatures[order_id]
+        assert roo.dish_index.buckets[signature].priority(order_id) == pytest.approx(roo.orders.priority(order_id))
+
+
+def test_buckets_agree_with_main_heap(queued_roo):
+    roo, generator = queued_roo(3, 0, kinetic=True)
+    rng, clock = generator.rng, roo.clock
+    for order_id in range(200):
+        clock.advance_to(clock.now + generator.next_gap())
+        roo.add_order(generator.make_order(order_id, clock.now))
+        if rng.random() < 0.3:
+            roo.optimize_orders()
+        if rng.random() < 0.1:
+            roo.take_group()
+        # Every bucket agrees with the main heap, including buckets created since the last rescoring
+        for bucket in roo.dish_index.buckets.values():
+            for priority, order in bucket:
+                assert priority == pytest.approx(roo.orders.priority(order.order_id))
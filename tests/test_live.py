@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from order_optimization.changes import RESCORED
+from order_optimization.utils import OrderCardCache
+from order_simulation.live import LiveSimulation
+
+def fast_simulation(n_orders, **settings):
+    simulation = LiveSimulation(n_orders, seconds_per_complexity=0.0005, seed=1, **settings)
+    simulation.generator.interarrival = (0, 0.0005)
+    return simulation
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.001)
+    return condition()
+
+
+def test_snapshot_pages_the_cooking_group_then_the_queue():
+    simulation = LiveSimulation(0, seed=0)
+    roo = simulation.roo
+    for order_id in range(40):
+        roo.add_order(simulation.generator.make_order(order_id, roo.clock()))
+    roo.optimize_orders()
+    roo.start_order()
+    cooking = [order.order_id for order in roo.current_order]
+    queue = [order.order_id for _, order in roo.orders.iter_sorted()]
+
+    cache = OrderCardCache()
+    snapshot = simulation.snapshot(limit=10, cache=cache)
+    assert [order.order_id for _, order in snapshot.orders] == (cooking + queue)[:10]
+    assert [priority for priority, _ in snapshot.orders[:len(cooking)]] == ['Doing Order'] * len(cooking)
+    assert snapshot.current_order_ids == set(cooking)
+    assert snapshot.queued == len(queue)
+    assert cache.version == roo.version
+    # Copies, so rendering never reads an order the worker is changing
+    assert all(order is not roo.orders.get(order.order_id) for _, order in snapshot.orders)
+    assert len(simulation.snapshot().orders) == len(cooking) + len(queue)
+    assert snapshot.metrics is None and snapshot.prometheus is None
+
+
+def test_run_cooks_every_order_through_roo():
+    simulation = fast_simulation(25, metrics=True).start()
+    seen_processing = wait_for(lambda: simulation.snapshot(limit=1).processing is not None or simulation.finished)
+    assert seen_processing
+    assert wait_for(lambda: simulation.finished)
+    snapshot = simulation.snapshot(prometheus=True)
+    assert snapshot.completed == 25 and snapshot.queued == 0 and not snapshot.orders
+    assert snapshot.metrics['groups_started'] > 0
+    assert 'roo_queue_length 0' in snapshot.prometheus
+    assert simulation.roo.metrics.latency['process_group'].count > 0
+
+
+def test_configure_rescores_the_running_queue():
+    simulation = fast_simulation(400)
+    # The kitchen never picks up work, so orders pile up while the weights change
+    simulation.rng.random = lambda: 1.0
+    simulation.configure(seconds_per_complexity=0.01)
+    simulation.start()
+    try:
+        assert wait_for(lambda: simulation.snapshot().queued >= 20)
+        roo = simulation.roo
+        version = roo.version
+        simulation.configure(driver_weight=False, metrics=True)
+        with simulation.lock:
+            assert roo.driver_weight is False and roo.model.driver_weight is False
+            assert any(kind == RESCORED for _, kind, _ in roo.changes_since(version))
+            priorities = [priority for priority, _ in roo.orders.iter_sorted()]
+            assert priorities == sorted(priorities)
+        assert simulation.snapshot().metrics is not None
+        simulation.configure(metrics=False)
+        assert simulation.snapshot().metrics is None
+        assert simulation.events.seconds_per_minute == 0.01
+        with pytest.raises(TypeError):
+            simulation.configure(speed=2)
+    finally:
+        simulation.stop(5)
+    assert not simulation.running
@@ -0,0 +1,20 @@
+from order_optimization.order import Dish, Order, menu
+
+
+def test_name_lookup_keeps_the_first_registration():
+    first = Dish('Test Calzone', 9)
+    assert menu.named('Test Calzone') is first
+    # A dish of the same name with another complexity is a dish of its own
+    other = Dish('Test Calzone', 4)
+    assert other is not first and other.bit != first.bit
+    assert menu.named('Test Calzone') is first
+    assert Dish('Test Calzone', 4) is other
+
+
+def test_order_mask_and_complexity_follow_its_dishes():
+    calzone, other = Dish('Test Calzone', 9), Dish('Test Calzone', 4)
+    order = Order(1, 0.0, [calzone, other], 'Glovo', 12)
+    assert order.dish_mask == calzone.bit | other.bit
+    assert order.total_complexity == order.dish_complexity == 13
+    order.dishes = [other]
+    assert order.dish_mask == other.bit and order.dish_complexity == 4
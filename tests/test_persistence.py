@@ -0,0 +1,141 @@
+import random
+
+import pytest
+
+from order_optimization.changes import COMPLETED
+from order_optimization.order import Dish, Order, menu
+from order_optimization.order_optimization import ROO
+from order_optimization.persistence import OrderJournal
+from order_simulation.simulation import OrderGenerator, VirtualClock
+
+FIELDS = ('order_time', 'dish_mask', 'total_complexity', 'source', 'driver_wait_time', 'updating_order_driver_time',
+          'start_time', 'end_time', 'group_order_id')
+
+def state(roo):
+    orders = {order.order_id: (False,) + tuple(getattr(order, name) for name in FIELDS) for _, order in roo.orders}
+    for order in roo.current_order or []:
+        orders[order.order_id] = (True,) + tuple(getattr(order, name) for name in FIELDS)
+    return orders
+
+
+def queue(roo):
+    # (order_id, priority) in the order start_order would take them
+    return [(order.order_id, priority) for priority, order in roo.orders.iter_sorted()]
+
+
+def assert_same_queue(restored, expected):
+    assert [order_id for order_id, _ in queue(restored)] == [order_id for order_id, _ in expected]
+    assert [priority for _, priority in queue(restored)] == pytest.approx([priority for _, priority in expected])
+
+
+def completions(roo):
+    # order_id -> end_time of every order roo completes from now on
+    done = {}
+    roo.changes.listeners.append(lambda kind, order: done.__setitem__(order.order_id, order.end_time)
+                                 if kind == COMPLETED else None)
+    return done
+
+
+@pytest.mark.parametrize('mode', [{}, {'vectorized': True}, {'kinetic': True}])
+def test_snapshot_and_tail_round_trip(tmp_path, mode):
+    rng = random.Random(0)
+    clock = VirtualClock(1_700_000_000.0)
+    roo = ROO(True, True, True, clock=clock, **mode)
+    generator = OrderGenerator(0)
+    for order_id in range(2000):
+        roo.add_order(generator.make_order(order_id, clock.now))
+        clock.advance_to(clock.now + 0.5)
+    roo.optimize_orders()
+    journal = OrderJournal(tmp_path, snapshot_every=10 ** 9)
+    journal.attach(roo)
+    completed = completions(roo)
+
+    next_id = 2000
+    for step in range(1500):
+        clock.advance_to(clock.now + 0.5)
+        action = rng.random()
+        if action < 0.4:
+            roo.add_order(generator.make_order(next_id, clock.now))
+            next_id += 1
+        elif action < 0.55:
+            roo.start_order()
+        elif action < 0.8 and roo.current_order:
+            roo.process_order()
+        elif action < 0.9:
+            roo.modify_order(rng.randrange(next_id), driver_wait_time=rng.randint(1, 30))
+        elif action < 0.97:
+            roo.cancel_order(rng.randrange(next_id))
+        else:
+            roo.optimize_orders()
+    # A rescoring pass and a completion right at the end of the tail
+    roo.optimize_orders()
+    roo.start_order()
+    done = len(completed)
+    while roo.current_order and len(completed) == done:
+        roo.process_order()
+    journal.flush()
+    expected = state(roo)
+    expected_queue = queue(roo)
+    journal.close()
+    assert completed
+    # The tail was journaled, not snapshotted
+    assert reopened_generations(tmp_path) == 1
+
+    restored = ROO(True, True, True, clock=clock, **mode)
+    replayed = completions(restored)
+    reopened = OrderJournal(tmp_path)
+    assert reopened.restore(restored) == len(expected)
+    assert state(restored) == expected
+    assert_same_queue(restored, expected_queue)
+    # Completions replayed from the tail keep the end time they were journaled with
+    for order_id, end_time in replayed.items():
+        assert end_time == completed[order_id]
+    assert reopened.last_order_id == next_id - 1
+
+
+def reopened_generations(directory):
+    return len(OrderJournal(directory).generations())
+
+
+@pytest.mark.parametrize('mode', [{}, {'vectorized': True}, {'kinetic': True}])
+def test_tail_orders_keep_their_place_in_the_queue(tmp_path, mode):
+    clock = VirtualClock(1_700_000_000.0)
+    roo = ROO(True, True, True, clock=clock, **mode)
+    generator = OrderGenerator(1)
+    for order_id in range(50):
+        clock.advance_to(clock.now + generator.next_gap())
+        roo.add_order(generator.make_order(order_id, clock.now))
+    roo.optimize_orders()
+    journal = OrderJournal(tmp_path)
+    journal.attach(roo)
+    for order_id in range(50, 60):
+        clock.advance_to(clock.now + generator.next_gap())
+        roo.add_order(generator.make_order(order_id, clock.now))
+    roo.modify_order(55, driver_wait_time=3)
+    expected = queue(roo)
+    journal.close()
+
+    # Restored ten minutes later: nothing may be scored at the restore time
+    clock.advance_to(clock.now + 600)
+    restored = ROO(True, True, True, clock=clock, **mode)
+    OrderJournal(tmp_path).restore(restored)
+    assert_same_queue(restored, expected)
+
+
+def test_dish_masks_wider_than_64_bits(tmp_path):
+    dishes = [Dish(f'Special {i}', 1 + i % 9) for i in range(70)]
+    assert dishes[-1].bit.bit_length() > 64
+    clock = VirtualClock(1_700_000_000.0)
+    roo = ROO(True, True, True, clock=clock)
+    journal = OrderJournal(tmp_path)
+    journal.attach(roo)
+    roo.add_order(Order(1, clock.now, dishes[-3:], 'Glovo', 12))
+    journal.snapshot()
+    roo.add_order(Order(2, clock.now, [dishes[0], dishes[-1]], 'Bolt Foods', 8))
+    journal.close()
+
+    restored = ROO(True, True, True, clock=clock)
+    assert OrderJournal(tmp_path).restore(restored) == 2
+    assert [dish.name for dish in restored.orders.get(1).dishes] == [dish.name for dish in dishes[-3:]]
+    assert restored.orders.get(2).dish_mask == dishes[0].bit | dishes[-1].bit
+    assert len(menu) >= 70
@@ -0,0 +1,56 @@
+import pyarrow.parquet as pq
+import pytest
+
+from order_optimization.order import Dish
+from order_simulation.replay import OutcomeWriter, TraceOrders, TraceReplay, write_trace
+from order_simulation.simulation import MENU
+
+START = 1_700_000_000.0
+
+@pytest.fixture(autouse=True)
+def menu():
+    # Trace dishes are looked up by name on the dashboard's menu
+    for name, complexity in MENU:
+        Dish(name, complexity)
+
+
+def replay(path, tmp_path):
+    orders = TraceOrders(str(path), batch_rows=4)
+    output = str(tmp_path / 'outcomes.parquet')
+    writer = OutcomeWriter(output, batch_rows=4)
+    simulation = TraceReplay(orders, writer=writer, seconds_per_complexity=0.05)
+    simulation.run()
+    writer.close()
+    return orders, simulation, pq.read_table(output)
+
+
+def test_replay_skips_and_counts_malformed_rows(tmp_path):
+    path = tmp_path / 'trace.csv'
+    rows = [
+        (1, START, 'Margherita;Vegan', 'Glovo', 12),
+        (2, START + 1, 'Pepperoni', 'Glovo', ''),  # delivery without a driver wait time
+        (3, START + 2, 'Mushroom', 'In Restaurant', ''),
+        (4, START + 3, 'Calzone', 'UberEats', 9),  # not on the menu
+        (5, START + 4, '', 'Bolt Foods', 7),
+        (6, START + 5, 'Supreme;Four Cheese', 'Bolt Foods', -3),
+        (7, START + 6, 'Vegan', 'UberEats', 15),
+    ]
+    path.write_text('order_id,order_time,dishes,source,driver_wait_time\n'
+                    + ''.join(','.join(str(value) for value in row) + '\n' for row in rows))
+    orders, simulation, outcomes = replay(path, tmp_path)
+    assert orders.skipped == 4
+    assert simulation.completed_orders == 3
+    assert sorted(outcomes['order_id'].to_pylist()) == [1, 3, 7]
+    # Only the two delivery orders had a driver to wait for
+    assert simulation.driver_orders == 2
+
+
+def test_parquet_trace_round_trip(tmp_path):
+    path = tmp_path / 'trace.parquet'
+    write_trace(str(path), 50, seed=3, batch_rows=16, start_time=START)
+    orders, simulation, outcomes = replay(path, tmp_path)
+    assert orders.skipped == 0
+    assert simulation.completed_orders == 50
+    assert sorted(outcomes['order_id'].to_pylist()) == list(range(50))
+    assert all(wait >= 0 for wait in outcomes['wait'].to_pylist())
+    assert simulation.summary()['orders'] == 50
@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+from order_optimization.order import Dish, Order, menu
+from order_optimization.order_optimization import ROO
+from order_optimization.service import IngestionService
+from order_simulation.simulation import MENU
+
+def post(service, body):
+    return service._route('POST', '/orders', json.dumps(body).encode())[0]
+
+
+def test_bad_orders_are_rejected_without_touching_the_menu():
+    for name, complexity in MENU:
+        Dish(name, complexity)
+    service = IngestionService(ROO(True, True, True))
+
+    async def run():
+        await service.start()
+        dishes = len(menu)
+        assert post(service, {'dishes': ['Vegan'], 'driver_wait_time': '12'}).startswith('400')
+        assert post(service, {'dishes': [['Brand new', 0]]}).startswith('400')
+        assert post(service, {'dishes': [['Vegan', 'seven']]}).startswith('400')
+        assert post(service, {'dishes': 'Vegan'}).startswith('400')
+        assert post(service, {'dishes': [['Vegan', 7]], 'source': 'Glovo', 'driver_wait_time': 12}).startswith('202')
+        assert len(menu) == dishes
+        await asyncio.wait_for(service.stop(drain=True), 5)
+
+    asyncio.run(run())
+    assert service.accepted == 1
+    assert len(service.roo.orders) == 1
+
+
+def test_client_order_ids_never_collide():
+    vegan = Dish(*MENU[3])
+    roo = ROO(True, True, True)
+    service = IngestionService(roo)
+
+    async def run():
+        await service.start()
+        # The id of the service's next order, and one that is not an integer at all
+        assert post(service, {'dishes': ['Vegan'], 'order_id': service.next_id + 2}).startswith('202')
+        assert post(service, {'dishes': ['Vegan'], 'order_id': 'a'}).startswith('202')
+        assert post(service, {'dishes': ['Vegan']}).startswith('202')
+        await asyncio.wait_for(service.pending.join(), 5)
+        # In process, a duplicate id is counted as failed instead of vanishing
+        assert service.offer(Order(1, roo.clock(), [vegan], 'Glovo', 5))
+        await asyncio.wait_for(service.stop(drain=True), 5)
+
+    asyncio.run(run())
+    assert sorted(order.order_id for _, order in roo.orders) == [1, 2, 3]
+    assert service.accepted == 4
+    assert service.failed == 1
+
+
+def test_ingest_survives_an_order_roo_cannot_add():
+    roo = ROO(True, True, True)
+    service = IngestionService(roo)
+    vegan = Dish('Vegan', 7)
+
+    async def run():
+        await service.start()
+        broken = Order(1, roo.clock(), [vegan], 'Glovo', 5)
+        broken.driver_wait_time = 'soon'
+        service.offer(broken)
+        await asyncio.wait_for(service.pending.join(), 5)
+        assert service.offer(Order(2, roo.clock(), [vegan], 'Glovo', 5))
+        await asyncio.wait_for(service.stop(drain=True), 5)
+
+    asyncio.run(run())
+    assert service.failed == 1
+    assert 2 in roo.orders
@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+import pytest
+
+from order_optimization.order import Dish
+from order_optimization.order_optimization import ROO
+from order_optimization.stations import KitchenExecutor, Station
+from order_simulation.simulation import MENU, OrderGenerator
+
+def within(order, dish_mask):
+    return dish_mask is None or not order.dish_mask & ~dish_mask
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_take_group_only_takes_orders_the_mask_covers(queued_roo, seed):
+    roo, generator = queued_roo(seed, 200)
+    dishes = generator.dishes
+    while roo.orders:
+        dish_mask = sum(dish.bit for dish in generator.rng.sample(dishes, 4))
+        priorities = {order.order_id: priority for priority, order in roo.orders}
+        covered = [order for _, order in roo.orders if within(order, dish_mask)]
+        group = roo.take_group(threshold=2, dish_mask=dish_mask)
+        if not covered:
+            assert group == []
+            roo.take_group()
+            continue
+        # The lead is the best order the mask covers, and its mate the best compatible one inside the band
+        lead = group[0]
+        assert priorities[lead.order_id] == min(priorities[order.order_id] for order in covered)
+        mates = [order for order in covered if order is not lead and roo.dishes_in_common(lead, order)
+                 and roo.priority_closeness(priorities[lead.order_id], priorities[order.order_id]) <= 2]
+        if mates:
+            assert len(group) == 2
+            assert priorities[group[1].order_id] == min(priorities[order.order_id] for order in mates)
+        else:
+            assert len(group) == 1
+        assert all(within(order, dish_mask) for order in group)
+
+
+def test_stations_cook_in_parallel_and_only_what_they_cover():
+    menu_dishes = [Dish(name, complexity) for name, complexity in MENU]
+    stations = [Station('Oven', dishes=menu_dishes[:3]), Station('Grill', dishes=menu_dishes[3:]),
+                Station('Line', capacity=3)]
+    roo = ROO(True, True, True)
+    kitchen = KitchenExecutor(roo, stations, seconds_per_complexity=0.0005)
+    generator = OrderGenerator(0)
+    cooked = {}  # order_id -> (order, station, time complete() ran)
+    busy = []
+    complete = kitchen.complete
+
+    def record(station):
+        busy.append(sum(not other.free for other in stations))
+        for order in station.current_order:
+            cooked[order.order_id] = (order, station, time.time())
+        return complete(station)
+    kitchen.complete = record
+
+    async def run():
+        task = asyncio.create_task(kitchen.run())
+        for order_id in range(120):
+            roo.add_order(generator.make_order(order_id, time.time()))
+            kitchen.notify()
+            if order_id % 10 == 9:
+                await asyncio.sleep(0.001)
+        deadline = time.time() + 10
+        while (roo.orders or roo.current_order) and time.time() < deadline:
+            await asyncio.sleep(0.005)
+        kitchen.stop()
+        await asyncio.wait_for(task, 5)
+
+    asyncio.run(run())
+    assert not roo.orders and not roo.current_order
+    assert sorted(cooked) == list(range(120))
+    for station in stations:
+        assert station.free and station.groups > 0
+    for order, station, completed_at in cooked.values():
+        assert within(order, station.dish_mask)
+        # Completed by its timer, not before the end time dispatch planned (asyncio timers may fire a hair early)
+        assert completed_at >= order.end_time - 0.001
+    assert max(busy) > 1
@@ -0,0 +1,25 @@
+import pandas as pd
+
+from order_simulation.sweep import KPIS, grid, run_config, sweep
+
+CONFIGS = grid({'threshold': [1.0, 4.0], 'group_factor': [1.1]})
+
+def test_run_config_is_deterministic_per_seed():
+    task = (0, CONFIGS[0], 3, 60, 0.05, 1, None)
+    first = run_config(task)
+    assert run_config(task) == first
+    assert run_config((0, CONFIGS[0], 4, 60, 0.05, 1, None)) != first
+    assert set(KPIS) <= set(first)
+    assert 0 < first['utilization'] < 1
+
+
+def test_sweep_table_has_a_row_per_config():
+    table = sweep(CONFIGS, seeds=(0, 1), n_orders=60, workers=1)
+    assert list(table.index) == [0, 1]
+    assert list(table.columns) == (['threshold', 'group_factor', *KPIS]
+                                   + ['mean_lead_time_std', 'mean_driver_wait_std'])
+    assert table['threshold'].tolist() == [1.0, 4.0]
+    assert not table[list(KPIS)].isna().any().any()
+    # The same seeds give the same table, whether run in process or in worker processes
+    pd.testing.assert_frame_equal(sweep(CONFIGS, seeds=(0, 1), n_orders=60, workers=2), table)
+